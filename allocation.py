@@ -0,0 +1,80 @@
+# allocation.py
+# First-expiry-first-out (FEFO) allocation of a sale across medicine batches.
+
+import time
+from datetime import datetime
+
+import stock_ledger
+
+
+def _lock_batches(cursor, med_name, today):
+    # Only sellable batches: in stock and not yet expired, earliest expiry first.
+    # FOR UPDATE keeps a concurrent till from selling the same units.
+    cursor.execute("""
+        SELECT med_id, quantity, expiry_date
+        FROM medicines
+        WHERE name = %s AND quantity > 0 AND expiry_date >= %s
+        ORDER BY expiry_date ASC, med_id ASC
+        FOR UPDATE
+    """, (med_name, today))
+    return cursor.fetchall()
+
+
+def plan_allocation(batches, qty):
+    # batches: [(med_id, available_qty, expiry_date), ...] in FEFO order.
+    allocation = []
+    qty_needed = qty
+    for med_id, available_qty, expiry_date in batches:
+        if qty_needed <= 0:
+            break
+        to_deduct = min(qty_needed, available_qty)
+        allocation.append((med_id, to_deduct, expiry_date))
+        qty_needed -= to_deduct
+    return allocation
+
+
+def write_allocation(cursor, allocation, sale_date):
+    if not allocation:
+        return
+
+    cursor.executemany("""
+        INSERT INTO sales (med_id, quantity_sold, sale_date)
+        VALUES (%s, %s, %s)
+    """, [(med_id, qty, sale_date) for med_id, qty, _ in allocation])
+
+    # One statement for all batch decrements.
+    cases = " ".join(["WHEN %s THEN %s"] * len(allocation))
+    placeholders = ", ".join(["%s"] * len(allocation))
+    params = []
+    for med_id, qty, _ in allocation:
+        params.extend((med_id, qty))
+    params.extend(med_id for med_id, _, _ in allocation)
+    cursor.execute(f"""
+        UPDATE medicines
+        SET quantity = quantity - CASE med_id {cases} END
+        WHERE med_id IN ({placeholders})
+    """, params)
+    stock_ledger.record(cursor, [(med_id, -qty) for med_id, qty, _ in allocation], stock_ledger.SALE)
+
+
+def allocate_sale(conn, med_name, qty, sale_date=None, timings=None):
+    # Locks, allocates and writes the sale on conn. Returns
+    # [(med_id, quantity_sold, expiry_date), ...]; the caller commits or rolls back,
+    # so several sales can share one transaction. If timings is a dict, the time
+    # spent acquiring the batch row locks is stored under "lock_wait".
+    if qty <= 0:
+        raise ValueError("Sale quantity must be positive.")
+    today = datetime.today().date()
+    sale_date = sale_date or today.strftime('%Y-%m-%d')
+
+    cursor = conn.cursor()
+    try:
+        lock_start = time.perf_counter()
+        batches = _lock_batches(cursor, med_name, today)
+        if timings is not None:
+            timings["lock_wait"] = time.perf_counter() - lock_start
+        allocation = plan_allocation(batches, qty)
+        write_allocation(cursor, allocation, sale_date)
+    finally:
+        cursor.close()
+    return allocation
@@ -1,19 +1,68 @@
 # analytics_db.py
 
 from db_config import get_connection
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import csv
+import os
+import sys
+import time
+import exporters
+from expiry_status import status_series
+from rollup import DAILY_SALES_SOURCE
+from stock_summary import stock_source
+
+# pandas is imported inside the reports that need it, so starting the menu and
+# running the simple reports never pays for it.
+
+def _write_csv(filename, headers, rows):
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        # LF line endings, like the pandas to_csv reports.
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+def _print_table(headers, rows):
+    # Aligned table like df.to_string(index=False).
+    if not rows:
+        print(f"Empty result\nColumns: [{', '.join(headers)}]")
+        return
+    cells = [[str(v) for v in row] for row in rows]
+    widths = [max(len(h), *(len(r[i]) for r in cells)) for i, h in enumerate(headers)]
+    print(" ".join(h.rjust(w) for h, w in zip(headers, widths)))
+    for r in cells:
+        print(" ".join(v.rjust(w) for v, w in zip(r, widths)))
+
+def _write_csv_and_print(filename, headers, rows):
+    # pandas-free path for the simple reports.
+    _write_csv(filename, headers, rows)
+    _print_table(headers, rows)
+
+def _fetch(query, params=()):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        headers = [d[0] for d in cursor.description]
+        return headers, cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
 
 def top_selling_medicines():
+    import pandas as pd
     conn = get_connection()
-    query = """
-        SELECT m.name AS Medicine, SUM(s.quantity_sold) AS Total_Sold
-        FROM sales s
-        JOIN medicines m ON s.med_id = m.med_id
-        GROUP BY s.med_id
-        ORDER BY Total_Sold DESC
-        LIMIT 5
+    query = f"""
+        SELECT m.name AS Medicine, t.Total_Sold
+        FROM (
+            SELECT d.med_id, SUM(d.qty) AS Total_Sold
+            FROM {DAILY_SALES_SOURCE} d
+            GROUP BY d.med_id
+            ORDER BY Total_Sold DESC
+            LIMIT 5
+        ) t
+        JOIN medicines m ON t.med_id = m.med_id
+        ORDER BY t.Total_Sold DESC
     """
     df = pd.read_sql(query, conn)
     df.to_csv("top_selling_medicines.csv", index=False)
@@ -22,21 +71,19 @@ def top_selling_medicines():
     conn.close()
 
 def low_stock_medicines(threshold=20):
-    conn = get_connection()
-    query = """
-        SELECT name AS Medicine, quantity AS Stock
-        FROM medicines
-        WHERE quantity < %s
-        ORDER BY quantity ASC
+    # Sellable (in stock, not expired) units per medicine, from medicine_stock.
+    source, params = stock_source()
+    query = f"""
+        SELECT name AS Medicine, sellable_qty AS Stock
+        FROM {source}
+        WHERE sellable_qty < %s
+        ORDER BY sellable_qty ASC, name ASC
     """
-    df = pd.read_sql(query, conn, params=(threshold,))
-    df.to_csv("low_stock_medicines.csv", index=False)
+    headers, rows = _fetch(query, params + [threshold])
     print(f"\n Low Stock Medicines (less than {threshold} units):")
-    print(df.to_string(index=False))
-    conn.close()
+    _write_csv_and_print("low_stock_medicines.csv", headers, rows)
 
 def expiring_soon(days=30):
-    conn = get_connection()
     future_date = (datetime.today() + timedelta(days=days)).strftime('%Y-%m-%d')
     query = """
         SELECT name AS Medicine, expiry_date
@@ -44,19 +91,18 @@ def expiring_soon(days=30):
         WHERE expiry_date <= %s
         ORDER BY expiry_date ASC
     """
-    df = pd.read_sql(query, conn, params=(future_date,))
-    df.to_csv("medicines_expiring_soon.csv", index=False)
+    headers, rows = _fetch(query, (future_date,))
     print(f"\n Medicines Expiring Within {days} Days:")
-    print(df.to_string(index=False))
-    conn.close()
+    _write_csv_and_print("medicines_expiring_soon.csv", headers, rows)
 
 def daily_sales_report():
+    import pandas as pd
     conn = get_connection()
-    query = """
-        SELECT sale_date AS Date, SUM(quantity_sold) AS Total_Sold
-        FROM sales
-        GROUP BY sale_date
-        ORDER BY sale_date DESC
+    query = f"""
+        SELECT d.sale_date AS Date, SUM(d.qty) AS Total_Sold
+        FROM {DAILY_SALES_SOURCE} d
+        GROUP BY d.sale_date
+        ORDER BY d.sale_date DESC
     """
     df = pd.read_sql(query, conn)
     df.to_csv("daily_sales_report.csv", index=False)
@@ -65,6 +111,7 @@ def daily_sales_report():
     conn.close()
 
 def supplier_supply_log():
+    import pandas as pd
     conn = get_connection()
     query = """
         SELECT 
@@ -72,9 +119,8 @@ def supplier_supply_log():
             m.name AS Medicine,
             m.added_on AS Supplied_On,
             m.quantity AS Quantity
-        FROM suppliers s
-        JOIN medicine_supplier ms ON s.supplier_id = ms.supplier_id
-        JOIN medicines m ON ms.med_id = m.med_id
+        FROM medicines m
+        JOIN suppliers s ON s.supplier_id = m.supplier_id
         ORDER BY s.name ASC, m.added_on DESC
     """
     df = pd.read_sql(query, conn)
@@ -84,15 +130,15 @@ def supplier_supply_log():
     conn.close()
 
 def supplier_cost_summary():
+    import pandas as pd
     conn = get_connection()
     query = """
         SELECT 
             s.name AS Supplier,
             ROUND(SUM(m.quantity * m.price), 2) AS Total_Cost
-        FROM suppliers s
-        JOIN medicine_supplier ms ON s.supplier_id = ms.supplier_id
-        JOIN medicines m ON ms.med_id = m.med_id
-        GROUP BY s.supplier_id
+        FROM medicines m
+        JOIN suppliers s ON s.supplier_id = m.supplier_id
+        GROUP BY s.supplier_id, s.name
         ORDER BY Total_Cost DESC
     """
     df = pd.read_sql(query, conn)
@@ -101,50 +147,150 @@ def supplier_cost_summary():
     print(df.to_string(index=False))
     conn.close()
 
-def export_inventory_to_csv():
-    conn = get_connection()
-    today = datetime.today().date()
-    near_expiry = today + timedelta(days=30)
+def reorder_forecast():
+    # Demand-based reorder quantities; see reorder.py for the model and options.
+    import reorder
+    df, _ = reorder.reorder_report("reorder.csv")
+    print("\n===  Reorder Forecast ===")
+    print(df.to_string(index=False))
 
-    query = """
-        SELECT med_id, name, category, manufacturer, quantity, price, expiry_date, added_on
-        FROM medicines
-        ORDER BY name ASC, expiry_date ASC
-    """
-    df = pd.read_sql(query, conn)
-    if df.empty:
+def export_inventory_to_csv():
+    # Streams rows to the file in chunks; status is computed in SQL.
+    result = exporters.export_inventory("medicine_inventory_report.csv")
+    if result["rows"] == 0:
+        os.remove(result["path"])
         print(" No medicines found in inventory.")
     else:
-        # Assign status based on expiry
-        df['status'] = df['expiry_date'].apply(
-            lambda x: 'EXPIRED' if x < today else ('NEAR EXPIRY' if x <= near_expiry else 'OK')
-        )
-        df.to_csv("medicine_inventory_report.csv", index=False)
         print(" Inventory CSV report generated: medicine_inventory_report.csv")
-    
-    conn.close()
 
 def export_sales_to_csv():
-    conn = get_connection()
-    query = """
-        SELECT 
-            s.sale_id,
-            m.name AS medicine_name,
-            m.manufacturer,
-            s.quantity_sold,
-            s.sale_date
-        FROM sales s
-        JOIN medicines m ON s.med_id = m.med_id
-        ORDER BY s.sale_date DESC
-    """
-    df = pd.read_sql(query, conn)
-    if df.empty:
+    # Streams rows to the file in chunks, in sale_id order.
+    result = exporters.export_sales("sales_report.csv", checkpoint=False)
+    if result["rows"] == 0:
+        os.remove(result["path"])
         print(" No sales records found.")
     else:
-        df.to_csv("sales_report.csv", index=False)
         print(" Sales report exported successfully to 'sales_report.csv'")
-    
-    conn.close()
+
+# === All reports in one pass ===
+# Each base table is read once and every report is built from those rows in
+# memory; the reads and the streaming sales export run side by side on pooled
+# connections.
+
+ALL_MEDICINES_QUERY = """
+    SELECT med_id, name, category, manufacturer, quantity, price, expiry_date, added_on, supplier_id
+    FROM medicines
+"""
+
+ALL_DAILY_SALES_QUERY = f"""
+    SELECT d.sale_date, d.med_id, SUM(d.qty)
+    FROM {DAILY_SALES_SOURCE} d
+    GROUP BY d.sale_date, d.med_id
+"""
+
+ALL_SUPPLIERS_QUERY = """
+    SELECT supplier_id, name FROM suppliers
+"""
+
+def _all_stock_query():
+    source, params = stock_source()
+    return f"SELECT name, sellable_qty FROM {source}", params
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def _build_reports(medicines, daily_sales, suppliers, stock, threshold, days):
+    # Returns {filename: (title, headers, rows)} matching the single reports.
+    by_id = {m[0]: m for m in medicines}
+    reports = {}
+
+    per_med, per_day = {}, {}
+    for sale_date, med_id, qty in daily_sales:
+        per_med[med_id] = per_med.get(med_id, 0) + qty
+        per_day[sale_date] = per_day.get(sale_date, 0) + qty
+    top = sorted(per_med.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    reports["top_selling_medicines.csv"] = (
+        "Top-Selling Medicines", ["Medicine", "Total_Sold"],
+        [(by_id[med_id][1], total) for med_id, total in top if med_id in by_id])
+    reports["daily_sales_report.csv"] = (
+        "Daily Sales Report", ["Date", "Total_Sold"],
+        sorted(per_day.items(), reverse=True))
+
+    low = sorted((s for s in stock if s[1] < threshold), key=lambda s: (s[1], s[0].casefold()))
+    reports["low_stock_medicines.csv"] = (
+        f"Low Stock Medicines (less than {threshold} units)", ["Medicine", "Stock"], low)
+    limit = (datetime.today() + timedelta(days=days)).date()
+    expiring = sorted((m for m in medicines if m[6] is not None and m[6] <= limit), key=lambda m: m[6])
+    reports["medicines_expiring_soon.csv"] = (
+        f"Medicines Expiring Within {days} Days", ["Medicine", "expiry_date"],
+        [(m[1], m[6]) for m in expiring])
+
+    # Each batch counts once, for the supplier it is attributed to.
+    names = dict(suppliers)
+    attributed = [m for m in medicines if m[8] in names]
+    # Supplier name ASC, then most recently added first.
+    supplied = [(names[m[8]], m) for m in attributed]
+    supplied.sort(key=lambda item: item[1][7] or datetime.min, reverse=True)
+    supplied.sort(key=lambda item: item[0].casefold())
+    reports["supplier_supply_log.csv"] = (
+        "Supplier Supply Log", ["Supplier", "Medicine", "Supplied_On", "Quantity"],
+        [(name, m[1], m[7], m[4]) for name, m in supplied])
+
+    costs = {}
+    for m in attributed:
+        costs[m[8]] = costs.get(m[8], 0) + m[4] * m[5]
+    reports["supplier_cost_summary.csv"] = (
+        "Supplier Total Cost Summary", ["Supplier", "Total_Cost"],
+        sorted(((names[sid], round(total, 2)) for sid, total in costs.items()),
+               key=lambda row: row[1], reverse=True))
+
+    # expiry_date is nullable; NULL sorts first, as in MySQL.
+    inventory = sorted(medicines, key=lambda m: (m[1].casefold(), m[6] is not None, m[6] or date.min))
+    # Labelled in one vectorized pass rather than row by row.
+    statuses = status_series([m[6] for m in inventory]).tolist()
+    reports["medicine_inventory_report.csv"] = (
+        "Inventory", exporters.INVENTORY_COLUMNS,
+        [m[:8] + (status,) for m, status in zip(inventory, statuses)])
+    return reports
+
+def run_all_reports(threshold=20, days=30, show=False):
+    # Writes every report CSV plus both exports; returns {step: seconds}.
+    timings = {}
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        sales_export = pool.submit(
+            _timed, lambda: exporters.export_sales("sales_report.csv", checkpoint=False))
+        fetches = {
+            "fetch.medicines": pool.submit(_timed, _fetch, ALL_MEDICINES_QUERY),
+            "fetch.daily_sales": pool.submit(_timed, _fetch, ALL_DAILY_SALES_QUERY),
+            "fetch.suppliers": pool.submit(_timed, _fetch, ALL_SUPPLIERS_QUERY),
+            "fetch.medicine_stock": pool.submit(_timed, _fetch, *_all_stock_query()),
+        }
+        data = {}
+        for step, future in fetches.items():
+            (_, rows), timings[step] = future.result()
+            data[step] = rows
+
+        start = time.perf_counter()
+        reports = _build_reports(data["fetch.medicines"], data["fetch.daily_sales"],
+                                 data["fetch.suppliers"], data["fetch.medicine_stock"], threshold, days)
+        timings["build"] = time.perf_counter() - start
+
+        for filename, (title, headers, rows) in reports.items():
+            start = time.perf_counter()
+            _write_csv(filename, headers, rows)
+            if show and filename != "medicine_inventory_report.csv":
+                print(f"\n {title}:")
+                _print_table(headers, rows)
+            timings[filename] = time.perf_counter() - start
+
+        _, timings["sales_report.csv"] = sales_export.result()
+
+    print("\n=== Report timings ===")
+    for step, seconds in timings.items():
+        print(f"  {step:<32} {seconds * 1000:>10.1f} ms")
+    return timings
 
 def show_menu():
     while True:
@@ -157,9 +303,11 @@ def show_menu():
         print("6. Supplier Cost Summary")
         print("7. Export Inventory to CSV")
         print("8. Export Sales to CSV")
-        print("9. Exit")
+        print("9. Run All Reports")
+        print("10. Reorder Forecast")
+        print("11. Exit")
 
-        choice = input("Enter your choice (1-9): ")
+        choice = input("Enter your choice (1-11): ")
         if choice == '1':
             top_selling_medicines()
         elif choice == '2':
@@ -177,10 +325,18 @@ def show_menu():
         elif choice == '8':
             export_sales_to_csv()
         elif choice == '9':
+            run_all_reports()
+        elif choice == '10':
+            reorder_forecast()
+        elif choice == '11':
             print(" Exiting Analytics.")
             break
         else:
             print(" Invalid choice. Try again.")
 
 if __name__ == "__main__":
-    show_menu()
+    # `python analytics.py all` writes every report without the menu.
+    if sys.argv[1:] == ["all"]:
+        run_all_reports()
+    else:
+        show_menu()
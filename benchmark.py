@@ -0,0 +1,217 @@
+# benchmark.py
+# Times the real entry points against whatever database db_config points at
+# and reports p50/p95 latency and throughput as JSON.
+#
+#   MEDINV_DB_BACKEND=sqlite MEDINV_DB_PATH=bench.db python generate_data.py --batches 20000 --sales 500000
+#   MEDINV_DB_BACKEND=sqlite MEDINV_DB_PATH=bench.db python benchmark.py --iterations 50 --output run.json
+#
+# record_sale really records sales (stock goes down), so benchmark a copy of
+# the data, not a live database.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import db_config
+import expiry_alerts
+import inventory_cache
+import stock_ledger
+from db_config import get_connection
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list.
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "mean_ms": round(total / len(samples) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+        "ops_per_sec": round(len(samples) / total, 1) if total else None,
+    }
+
+
+def time_workload(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+@contextlib.contextmanager
+def quiet_in(directory):
+    # Reports print tables and write CSVs into the working directory.
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.chdir(previous)
+
+
+def table_counts():
+    conn = get_connection()
+    cursor = conn.cursor()
+    counts = {}
+    try:
+        for table in ("medicines", "suppliers", "sales"):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+    return counts
+
+
+def hot_medicine_names(limit=200):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT name FROM medicines
+            WHERE quantity > 0 AND expiry_date >= %s
+            GROUP BY name
+            ORDER BY SUM(quantity) DESC
+            LIMIT %s
+        """, (date.today(), limit))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def build_workloads(rng, names):
+    import main
+
+    def with_conn(fn):
+        def run():
+            conn = get_connection()
+            try:
+                fn(conn)
+            finally:
+                conn.close()
+        return run
+
+    def drain(rows):
+        for _ in rows:
+            pass
+
+    workloads = {
+        "record_sale": lambda: main.process_sale(rng.choice(names), rng.randint(1, 3)),
+        "view_medicines.first_page": with_conn(lambda conn: main.fetch_medicines_page(conn)),
+        "view_medicines.name_prefix": with_conn(
+            lambda conn: main.fetch_medicines_page(conn, name_prefix=rng.choice(names)[:-1])),
+        "view_medicines.full_dump": with_conn(lambda conn: drain(main.iter_medicines(conn))),
+        "view_stock.first_page": with_conn(lambda conn: main.fetch_stock_page(conn)),
+        "view_stock.low_stock": with_conn(lambda conn: main.fetch_stock_page(conn, below=20)),
+        "view_sales.first_page": with_conn(lambda conn: main.fetch_sales_page(conn)),
+        "expiry_alerts.run": with_conn(lambda conn: expiry_alerts.run(conn)),
+        "stock_ledger.on_date": with_conn(
+            lambda conn: stock_ledger.stock_on(conn, date.today() - timedelta(days=rng.randint(0, 30)))),
+    }
+
+    try:
+        import analytics
+        import dashboard_queries as dq
+    except ImportError as e:
+        print(f"Skipping analytics and dashboard workloads ({e}).")
+        return workloads
+
+    for report in ("top_selling_medicines", "low_stock_medicines", "expiring_soon",
+                   "daily_sales_report", "supplier_supply_log", "supplier_cost_summary",
+                   "export_inventory_to_csv", "export_sales_to_csv", "run_all_reports",
+                   "reorder_forecast"):
+        workloads[f"analytics.{report}"] = getattr(analytics, report)
+
+    start_date, end_date = date(2020, 1, 1), date.today()
+    start_dt = datetime.combine(start_date, datetime.min.time())
+    end_dt = datetime.combine(end_date, datetime.max.time())
+    workloads.update({
+        "dashboard.supplier_names": dq.supplier_names,
+        "dashboard.sales_page": lambda: dq.sales_page(start_date, end_date, "All"),
+        "dashboard.sales_count": lambda: dq.sales_count(start_date, end_date, "All"),
+        "dashboard.sales_series": lambda: dq.sales_series(start_date, end_date, "All"),
+        "dashboard.top_sellers": lambda: dq.top_sellers(start_date, end_date, "All"),
+        "dashboard.inventory": lambda: dq.inventory(end_date, "All", None),
+        "dashboard.inventory_count": lambda: dq.inventory_count(end_date, "All", None),
+        "dashboard.inventory_by_category": lambda: dq.inventory_by_category(end_date, "All", None),
+        "dashboard.supplier_costs": lambda: dq.supplier_costs(start_dt, end_dt, "All"),
+        "dashboard.stock_kpis": lambda: dq.stock_kpis("All"),
+    })
+    return workloads
+
+
+def run(iterations=20, warmup=2, only=None, seed=1):
+    rng = random.Random(seed)
+    names = hot_medicine_names()
+    if not names:
+        raise SystemExit("No sellable stock found; run generate_data.py first.")
+
+    workloads = build_workloads(rng, names)
+    if only:
+        workloads = {name: fn for name, fn in workloads.items() if any(name.startswith(o) for o in only)}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, fn in workloads.items():
+            with quiet_in(workdir):
+                results[name] = time_workload(fn, iterations, warmup)
+            print(f"  {name:<40} p50 {results[name]['p50_ms']:>9.3f} ms   p95 {results[name]['p95_ms']:>9.3f} ms")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "backend": db_config.BACKEND,
+            "python": platform.python_version(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "rows": table_counts(),
+        },
+        "results": results,
+        "pool": db_config.pool_stats(),
+        "cache": inventory_cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inventory workloads.")
+    parser.add_argument("--iterations", type=int, default=20, help="timed runs per workload")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per workload")
+    parser.add_argument("--only", nargs="*", help="workload name prefixes to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.warmup, args.only, args.seed)
+    payload = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        print(f"Results written to {args.output}")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
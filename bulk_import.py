@@ -0,0 +1,264 @@
+# bulk_import.py
+# Streaming import of supplier CSV manifests into the medicines table.
+#
+# Expected columns: name, category, quantity, price, expiry_date, manufacturer, supplier
+#   python bulk_import.py manifest.csv --chunk-size 2000 --rejects rejected.csv
+
+import argparse
+import csv
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import stock_ledger
+from db_config import get_connection
+
+REQUIRED_COLUMNS = ["name", "category", "quantity", "price", "expiry_date", "manufacturer", "supplier"]
+
+
+def parse_row(row):
+    # Returns (name, category, quantity, price, expiry, manufacturer, supplier) or raises ValueError.
+    missing = [col for col in REQUIRED_COLUMNS if not (row.get(col) or "").strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    try:
+        quantity = int(row["quantity"])
+    except ValueError:
+        raise ValueError(f"bad quantity {row['quantity']!r}")
+    if quantity <= 0:
+        raise ValueError(f"quantity must be positive, got {quantity}")
+
+    try:
+        price = Decimal(row["price"].strip()).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"bad price {row['price']!r}")
+    if price < 0:
+        raise ValueError(f"price must not be negative, got {price}")
+
+    try:
+        expiry = datetime.strptime(row["expiry_date"].strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"bad expiry_date {row['expiry_date']!r}")
+
+    return (
+        row["name"].strip(),
+        row["category"].strip(),
+        quantity,
+        price,
+        expiry,
+        row["manufacturer"].strip(),
+        row["supplier"].strip(),
+    )
+
+
+def read_chunks(path, chunk_size, rejects):
+    # Yields (line_numbers, parsed_rows) per chunk; invalid lines are appended
+    # to rejects as (line_no, reason, row).
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        absent = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or [])]
+        if absent:
+            raise ValueError(f"CSV is missing columns: {', '.join(absent)}")
+
+        lines, chunk = [], []
+        for row in reader:
+            try:
+                chunk.append(parse_row(row))
+            except ValueError as e:
+                rejects.append((reader.line_num, str(e), row))
+                continue
+            lines.append(reader.line_num)
+            if len(chunk) >= chunk_size:
+                yield lines, chunk
+                lines, chunk = [], []
+        if chunk:
+            yield lines, chunk
+
+
+# Keys per lookup statement, below SQLite's limit of 500 terms in a compound SELECT.
+LOOKUP_GROUP = 400
+
+
+def _lookup(cursor, select, keys):
+    # Runs select (whose first column is "%s AS k") once per key as one UNION ALL
+    # per group and returns {key: second column}. The database does the
+    # comparing, so its collation decides what matches (case- and
+    # accent-insensitive on MySQL, NOCASE on SQLite), not an approximation of
+    # it in Python; results are keyed by the caller's spelling.
+    found = {}
+    for start in range(0, len(keys), LOOKUP_GROUP):
+        group = keys[start:start + LOOKUP_GROUP]
+        params = [v for i, key in enumerate(group, start) for v in (i, *key)]
+        cursor.execute(" UNION ALL ".join([select] * len(group)), params)
+        for i, value in cursor.fetchall():
+            if value is not None:
+                found[keys[i]] = value
+    return found
+
+
+class SupplierCache:
+    # supplier name as spelled in the manifest -> supplier_id, filled with one
+    # query per chunk for unseen names.
+
+    def __init__(self):
+        self.ids = {}
+        self.uncommitted = []  # names of suppliers inserted in the open transaction
+
+    def get(self, name):
+        return self.ids[name]
+
+    def commit(self):
+        self.uncommitted = []
+
+    def rollback(self):
+        for name in self.uncommitted:
+            self.ids.pop(name, None)
+        self.uncommitted = []
+
+    def resolve(self, cursor, names):
+        unseen = [(n,) for n in names if n not in self.ids]
+        if not unseen:
+            return
+        found = _lookup(cursor, "SELECT %s AS k, MIN(supplier_id) FROM suppliers WHERE name = %s", unseen)
+        for (name,), supplier_id in found.items():
+            self.ids[name] = supplier_id
+        for (name,) in unseen:
+            if name in self.ids:
+                continue
+            # One at a time: two spellings of a new supplier must create one row.
+            cursor.execute("SELECT MIN(supplier_id) FROM suppliers WHERE name = %s", (name,))
+            supplier_id = cursor.fetchone()[0]
+            if supplier_id is None:
+                cursor.execute("INSERT INTO suppliers (name) VALUES (%s)", (name,))
+                supplier_id = cursor.lastrowid
+                self.uncommitted.append(name)
+            self.ids[name] = supplier_id
+
+
+def _identity(row):
+    name, category, _, price, expiry, manufacturer, _ = row
+    return name, expiry, manufacturer, category, price
+
+
+def upsert_batches(cursor, rows, added_on, suppliers):
+    # A batch keeps the supplier that first delivered it (medicines.supplier_id).
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+    params = []
+    for name, category, quantity, price, expiry, manufacturer, supplier in rows:
+        params.extend((name, category, quantity, price, expiry, manufacturer, added_on, suppliers.get(supplier)))
+    cursor.execute(f"""
+        INSERT INTO medicines (name, category, quantity, price, expiry_date, manufacturer, added_on, supplier_id)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity),
+                                supplier_id = COALESCE(supplier_id, VALUES(supplier_id))
+    """, params)
+
+
+def fetch_batch_ids(cursor, rows):
+    # Map each batch identity in the chunk, as spelled in the manifest, to the
+    # med_id its upsert landed on (via uq_medicines_batch).
+    keys = list(dict.fromkeys(_identity(row) for row in rows))
+    return _lookup(cursor, """
+        SELECT %s AS k, med_id FROM medicines
+        WHERE name = %s AND expiry_date = %s AND manufacturer = %s AND category = %s AND price = %s
+    """, keys)
+
+
+def link_suppliers(cursor, rows, batch_ids, suppliers):
+    links = {(batch_ids[_identity(row)], suppliers.get(row[6])) for row in rows}
+    values = ", ".join(["(%s, %s)"] * len(links))
+    cursor.execute(
+        f"INSERT IGNORE INTO medicine_supplier (med_id, supplier_id) VALUES {values}",
+        [v for link in links for v in link],
+    )
+
+
+def record_intake(cursor, rows, batch_ids):
+    stock_ledger.record(cursor, [(batch_ids[_identity(row)], row[2]) for row in rows], stock_ledger.INTAKE)
+
+
+def import_manifest(path, chunk_size=1000):
+    rejects = []
+    imported = 0
+    suppliers = SupplierCache()
+    added_on = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    start = time.perf_counter()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for lines, chunk in read_chunks(path, chunk_size, rejects):
+            while chunk:
+                suppliers.resolve(cursor, {row[6] for row in chunk})
+                upsert_batches(cursor, chunk, added_on, suppliers)
+                batch_ids = fetch_batch_ids(cursor, chunk)
+                missed = {i for i, row in enumerate(chunk) if _identity(row) not in batch_ids}
+                if missed:
+                    # The lookup compares like the upsert did, so this needs a
+                    # concurrent delete; reject those lines and redo the rest.
+                    conn.rollback()
+                    suppliers.rollback()
+                    for i in sorted(missed):
+                        rejects.append((lines[i], "batch not found after upsert",
+                                        dict(zip(REQUIRED_COLUMNS, chunk[i]))))
+                    lines = [n for i, n in enumerate(lines) if i not in missed]
+                    chunk = [row for i, row in enumerate(chunk) if i not in missed]
+                    continue
+                link_suppliers(cursor, chunk, batch_ids, suppliers)
+                record_intake(cursor, chunk, batch_ids)
+                conn.commit()
+                suppliers.commit()
+                break
+
+            imported += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  {imported} rows imported ({imported / elapsed:.0f} rows/sec)")
+    except Exception:
+        conn.rollback()
+        suppliers.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "imported": imported,
+        "rejected": len(rejects),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(imported / elapsed, 1) if elapsed else 0.0,
+        "rejects": rejects,
+    }
+
+
+def write_rejects(path, rejects):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "reason"] + REQUIRED_COLUMNS)
+        for line_no, reason, row in rejects:
+            writer.writerow([line_no, reason] + [row.get(col, "") for col in REQUIRED_COLUMNS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import a supplier CSV manifest.")
+    parser.add_argument("manifest", help="CSV file to import")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per statement/commit")
+    parser.add_argument("--rejects", help="write rejected lines to this CSV")
+    args = parser.parse_args()
+
+    result = import_manifest(args.manifest, chunk_size=args.chunk_size)
+
+    print(f"\nImported {result['imported']} rows in {result['seconds']}s "
+          f"({result['rows_per_sec']} rows/sec), rejected {result['rejected']}.")
+    for line_no, reason, _ in result["rejects"][:10]:
+        print(f"  line {line_no}: {reason}")
+    if result["rejected"] > 10:
+        print(f"  ... {result['rejected'] - 10} more")
+    if args.rejects and result["rejects"]:
+        write_rejects(args.rejects, result["rejects"])
+        print(f"Rejected lines written to {args.rejects}")
+
+
+if __name__ == "__main__":
+    main()
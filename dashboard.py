@@ -1,22 +1,157 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
-from db_config import get_connection
+import dashboard_queries as queries
+from expiry_status import EXPIRED, NEAR_EXPIRY, OK
 
 st.set_page_config(page_title="Inventory Dashboard", layout="wide")
 st.title("Medicine Inventory & Sales Dashboard")
+render_start = time.perf_counter()
 
-# === Load Data ===
-conn = get_connection()
+# === Data Loading (cached) ===
+# Every loader returns an aggregate or one page of rows; nothing scales with
+# the size of the tables.
+CACHE_TTL_SECONDS = 300  # cached query results expire after this
+SALES_RECOUNT_SECONDS = 3600  # incremental sales counts are recounted after this
+MAX_SALES_COUNTS = 8  # distinct filter combinations kept in memory
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_suppliers():
+    return queries.supplier_names()
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_sales_page(start_date, end_date, supplier, limit, offset):
+    return queries.sales_page(start_date, end_date, supplier, limit, offset)
+
+
+class SalesCount:
+    # Sales rows for one filter combination; each rerun only counts sale_id > last_sale_id.
+    # Archived sales and sales committed out of sale_id order are picked up by
+    # the periodic recount.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.last_sale_id = 0
+        self.counted_at = time.monotonic()
+
+
+class SalesCounts:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            count = self.counts.get(key)
+            if count is None or time.monotonic() - count.counted_at > SALES_RECOUNT_SECONDS:
+                count = SalesCount()
+                self.counts[key] = count
+            self.counts.move_to_end(key)
+            while len(self.counts) > MAX_SALES_COUNTS:
+                self.counts.popitem(last=False)
+            return count
+
+    def clear(self):
+        with self.lock:
+            self.counts.clear()
+
+
+@st.cache_resource
+def sales_counts():
+    return SalesCounts()
+
+
+def load_sales_count(start_date, end_date, supplier):
+    count = sales_counts().get((start_date, end_date, supplier))
+    with count.lock:
+        rows, last_sale_id = queries.sales_count_since(start_date, end_date, supplier, count.last_sale_id)
+        count.rows += rows
+        count.last_sale_id = max(count.last_sale_id, last_sale_id)
+        return count.rows
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_sales_series(start_date, end_date, supplier, period):
+    return queries.sales_series(start_date, end_date, supplier, period)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_top_sellers(start_date, end_date, supplier, limit=10):
+    return queries.top_sellers(start_date, end_date, supplier, limit)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_inventory(as_of, supplier, status, limit, offset):
+    return queries.inventory(as_of, supplier, status, limit, offset)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_inventory_count(as_of, supplier, status):
+    return queries.inventory_count(as_of, supplier, status)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_inventory_by_category(as_of, supplier, status):
+    return queries.inventory_by_category(as_of, supplier, status)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_sales_total(start_date, end_date, supplier):
+    return queries.sales_total(start_date, end_date, supplier)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_stock_kpis(supplier):
+    return queries.stock_kpis(supplier)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_supplier_costs(start_dt, end_dt, supplier):
+    return queries.supplier_costs(start_dt, end_dt, supplier)
+
+
+# === Payload accounting ===
+payload = {"bytes": 0, "rows": 0, "points": 0}
+
+
+def show_chart(container, fig):
+    payload["bytes"] += len(fig.to_json())
+    payload["points"] += sum(len(trace.values if trace.type == "pie" else trace.x) for trace in fig.data)
+    container.plotly_chart(fig, use_container_width=True)
+
+
+def show_table(df):
+    payload["bytes"] += int(df.memory_usage(index=True, deep=True).sum())
+    payload["rows"] += len(df)
+    st.dataframe(df)
+
+
+def page_of(label, total, page_size, key):
+    # Page picker; returns the row offset of the chosen page. The widget key
+    # includes the row count and page size, so new filters start at page 1.
+    pages = max(1, -(-total // page_size))
+    page = st.number_input(f"{label} page (of {pages}, {total} rows)", min_value=1, max_value=pages,
+                           value=1, key=f"{key}:{total}:{page_size}")
+    return (page - 1) * page_size
 
-# Supplier Dropdown Data
-supplier_query = "SELECT DISTINCT name FROM suppliers"
-suppliers_list = pd.read_sql(supplier_query, conn)['name'].tolist()
 
 # Sidebar Filters
 st.sidebar.header("Filters")
 
+if st.sidebar.button("Refresh data"):
+    st.cache_data.clear()
+    sales_counts().clear()
+
+# Supplier Dropdown Data
+suppliers_list = load_suppliers()
+
 # Date Range
 min_date = datetime(2020, 1, 1)
 max_date = datetime.today()
@@ -28,76 +163,33 @@ end_dt = datetime.combine(end_date, datetime.max.time())
 supplier_filter = st.sidebar.selectbox("Filter by Supplier", ["All"] + suppliers_list)
 
 # Inventory Status Filter
-status_filter = st.sidebar.radio("Inventory Status", ["All", "Expired", "Near Expiry", "OK"])
-
-# === Sales Data ===
-sales_query = """
-    SELECT s.sale_date, m.name AS medicine_name, s.quantity_sold, sup.name AS supplier_name
-    FROM sales s
-    JOIN medicines m ON s.med_id = m.med_id
-    JOIN medicine_supplier ms ON ms.med_id = m.med_id
-    JOIN suppliers sup ON sup.supplier_id = ms.supplier_id
-"""
-df_sales = pd.read_sql(sales_query, conn)
-df_sales["sale_date"] = pd.to_datetime(df_sales["sale_date"])
-
-# Apply Sales Filters
-sales_mask = (df_sales["sale_date"] >= start_dt) & (df_sales["sale_date"] <= end_dt)
-if supplier_filter != "All":
-    sales_mask &= (df_sales["supplier_name"] == supplier_filter)
-filtered_sales = df_sales[sales_mask]
-
-# === Inventory Data ===
-inventory_query = """
-    SELECT m.med_id, m.name, m.category, m.quantity, m.price, m.expiry_date, m.added_on, sup.name AS supplier_name
-    FROM medicines m
-    JOIN medicine_supplier ms ON m.med_id = ms.med_id
-    JOIN suppliers sup ON sup.supplier_id = ms.supplier_id
-    WHERE m.added_on BETWEEN %s AND %s
-"""
-df_inventory = pd.read_sql(inventory_query, conn, params=(start_dt, end_dt))
-df_inventory["expiry_date"] = pd.to_datetime(df_inventory["expiry_date"])
-df_inventory["added_on"] = pd.to_datetime(df_inventory["added_on"])
-
-# Status Column
-today = datetime.today().date()
-df_inventory["status"] = df_inventory["expiry_date"].dt.date.apply(
-    lambda d: "Expired" if d < today else "Near Expiry" if d <= (today + timedelta(days=30)) else "OK"
-)
-
-# Apply Inventory Filters
-if supplier_filter != "All":
-    df_inventory = df_inventory[df_inventory["supplier_name"] == supplier_filter]
-if status_filter != "All":
-    df_inventory = df_inventory[df_inventory["status"] == status_filter]
-
-# === Supplier Cost Summary ===
-cost_query = """
-    SELECT sup.name AS Supplier, ROUND(SUM(m.quantity * m.price), 2) AS Total_Cost
-    FROM medicines m
-    JOIN medicine_supplier ms ON ms.med_id = m.med_id
-    JOIN suppliers sup ON sup.supplier_id = ms.supplier_id
-    WHERE m.added_on BETWEEN %s AND %s
-    GROUP BY sup.name
-"""
-df_suppliers = pd.read_sql(cost_query, conn, params=(start_dt, end_dt))
-if supplier_filter != "All":
-    df_suppliers = df_suppliers[df_suppliers["Supplier"] == supplier_filter]
-
-conn.close()
+status_labels = {"All": None, "Expired": EXPIRED, "Near Expiry": NEAR_EXPIRY, "OK": OK}
+status_filter = status_labels[st.sidebar.radio("Inventory Status", list(status_labels))]
+
+# Chart granularity: Auto picks day / week / month from the range width.
+period_labels = {"Auto": None, "Day": "day", "Week": "week", "Month": "month"}
+period = (period_labels[st.sidebar.selectbox("Sales Chart Granularity", list(period_labels))]
+          or queries.granularity(start_date, end_date))
+
+page_size = st.sidebar.selectbox("Rows per Page", queries.PAGE_SIZES)
+
+# === Load Data ===
+sales_chart = load_sales_series(start_date, end_date, supplier_filter, period)
+top_meds = load_top_sellers(start_date, end_date, supplier_filter)
+cat_dist = load_inventory_by_category(end_date, supplier_filter, status_filter)
+df_suppliers = load_supplier_costs(start_dt, end_dt, supplier_filter)
+total_sales = load_sales_total(start_date, end_date, supplier_filter)
+stock_kpis = load_stock_kpis(supplier_filter)
 
 # === Charts ===
 
-# Line Chart: Daily Sales
-sales_chart = filtered_sales.groupby("sale_date")["quantity_sold"].sum().reset_index()
-fig_line = px.line(sales_chart, x="sale_date", y="quantity_sold", title="Daily Sales")
+# Line Chart: Sales per day / week / month
+fig_line = px.line(sales_chart, x="period", y="quantity_sold", title=f"Sales per {period.capitalize()}")
 
 # Pie Chart: Inventory by Category
-cat_dist = df_inventory.groupby("category")["quantity"].sum().reset_index()
 fig_pie = px.pie(cat_dist, names="category", values="quantity", title="Stock by Category")
 
 # Bar Chart: Top-Selling Medicines
-top_meds = filtered_sales.groupby("medicine_name")["quantity_sold"].sum().reset_index().sort_values(by="quantity_sold", ascending=False).head(10)
 fig_bar = px.bar(top_meds, x="medicine_name", y="quantity_sold", title="Top-Selling Medicines")
 
 # Bar Chart: Supplier Cost Summary
@@ -105,26 +197,34 @@ fig_cost = px.bar(df_suppliers, x="Supplier", y="Total_Cost", title="Supplier Co
 
 # === KPIs ===
 st.markdown("### Key Metrics")
-col1, col2, col3 = st.columns(3)
-col1.metric("Total Sales", int(filtered_sales["quantity_sold"].sum()))
-col2.metric("Inventory Qty", int(df_inventory["quantity"].sum()))
-col3.metric("Expired Items", df_inventory[df_inventory["status"] == "Expired"].shape[0])
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Total Sales", total_sales)
+col2.metric("Inventory Qty", stock_kpis["total_qty"])
+col3.metric("Sellable Qty", stock_kpis["sellable_qty"])
+col4.metric("Out of Stock Medicines", stock_kpis["out_of_stock"])
 
 # === Show Charts ===
-st.plotly_chart(fig_line, use_container_width=True)
+show_chart(st, fig_line)
 
-col4, col5 = st.columns(2)
-col4.plotly_chart(fig_pie, use_container_width=True)
-col5.plotly_chart(fig_bar, use_container_width=True)
+col5, col6 = st.columns(2)
+show_chart(col5, fig_pie)
+show_chart(col6, fig_bar)
 
-st.plotly_chart(fig_cost, use_container_width=True)
+show_chart(st, fig_cost)
 
 # === Show Tables ===
 st.markdown("### Filtered Sales Data")
-st.dataframe(filtered_sales)
+sales_offset = page_of("Sales", load_sales_count(start_date, end_date, supplier_filter), page_size, "sales_page")
+show_table(load_sales_page(start_date, end_date, supplier_filter, page_size, sales_offset))
 
-st.markdown("### Current Inventory")
-st.dataframe(df_inventory)
+st.markdown(f"### Inventory on {end_date}")
+inventory_offset = page_of("Inventory", load_inventory_count(end_date, supplier_filter, status_filter),
+                           page_size, "inventory_page")
+show_table(load_inventory(end_date, supplier_filter, status_filter, page_size, inventory_offset))
 
 st.markdown("### Supplier Cost Summary")
-st.dataframe(df_suppliers)
+show_table(df_suppliers)
+
+# === Payload Readout ===
+st.caption(f"Payload: ~{payload['bytes'] / 1024:,.1f} KB ({payload['points']} chart points, "
+           f"{payload['rows']} table rows); rendered in {(time.perf_counter() - render_start) * 1000:,.0f} ms.")
@@ -0,0 +1,279 @@
+# dashboard_queries.py
+# Queries behind the Streamlit dashboard, kept free of Streamlit so they can be
+# cached by dashboard.py and timed by benchmark.py. Supplier filters and
+# per-supplier figures go through medicines.supplier_id, one supplier per
+# batch, so no row is counted twice.
+#
+# Everything is aggregated or paged in SQL: charts get at most a few hundred
+# points (sales per day, week or month depending on the range), tables one page
+# of rows, KPIs a single row.
+
+from datetime import date
+
+import pandas as pd
+
+import stock_ledger
+from db_config import BACKEND, get_connection
+from expiry_status import status_case_sql, status_filter_sql
+from rollup import DAILY_SALES_SOURCE
+from stock_summary import stock_source
+
+
+def read_sql(query, params=None):
+    conn = get_connection()
+    try:
+        return pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def supplier_names():
+    return read_sql("SELECT DISTINCT name FROM suppliers ORDER BY name")["name"].tolist()
+
+
+PAGE_SIZES = [25, 50, 100, 250]
+MAX_PAGE_SIZE = PAGE_SIZES[-1]
+
+# Widest range (in days) charted per day, then per week; wider ranges go per month.
+DAY_MAX_DAYS = 92
+WEEK_MAX_DAYS = 731
+
+
+def _sales_filters(start_date, end_date, supplier):
+    where = ["s.sale_date BETWEEN %s AND %s"]
+    params = [start_date, end_date]
+    if supplier != "All":
+        where.append("m.supplier_id IN (SELECT supplier_id FROM suppliers WHERE name = %s)")
+        params.append(supplier)
+    return " AND ".join(where), params
+
+
+def sales_page(start_date, end_date, supplier, limit=PAGE_SIZES[0], offset=0):
+    # One page of sales in the range, newest first; the order follows
+    # idx_sales_date_id (migration 013) so a page is read off the index, not sorted.
+    where, params = _sales_filters(start_date, end_date, supplier)
+    df = read_sql(f"""
+        SELECT s.sale_id, s.sale_date, m.name AS medicine_name, s.quantity_sold, sup.name AS supplier_name
+        FROM sales s
+        JOIN medicines m ON s.med_id = m.med_id
+        LEFT JOIN suppliers sup ON sup.supplier_id = m.supplier_id
+        WHERE {where}
+        ORDER BY s.sale_date DESC, s.sale_id DESC
+        LIMIT %s OFFSET %s
+    """, params + [min(limit, MAX_PAGE_SIZE), offset])
+    df["sale_date"] = pd.to_datetime(df["sale_date"])
+    return df
+
+
+def sales_count(start_date, end_date, supplier):
+    # Number of sale rows in the range, for paging the sales table.
+    return sales_count_since(start_date, end_date, supplier)[0]
+
+
+def sales_count_since(start_date, end_date, supplier, after_sale_id=0):
+    # (rows, highest sale_id) of the sales in the range with a higher sale_id,
+    # so a cached count only has to add the sales recorded since.
+    where, params = _sales_filters(start_date, end_date, supplier)
+    row = read_sql(f"""
+        SELECT COUNT(*) AS n, COALESCE(MAX(s.sale_id), 0) AS last_sale_id
+        FROM sales s
+        JOIN medicines m ON s.med_id = m.med_id
+        WHERE {where} AND s.sale_id > %s
+    """, params + [after_sale_id]).iloc[0]
+    return int(row["n"]), int(row["last_sale_id"])
+
+
+def _rollup_filters(start_date, end_date, supplier):
+    where = ["d.sale_date BETWEEN %s AND %s"]
+    params = [start_date, end_date]
+    if supplier != "All":
+        where.append("""d.med_id IN (
+            SELECT med_id FROM medicines
+            WHERE supplier_id IN (SELECT supplier_id FROM suppliers WHERE name = %s)
+        )""")
+        params.append(supplier)
+    return " AND ".join(where), params
+
+
+def granularity(start_date, end_date):
+    days = (end_date - start_date).days + 1
+    if days <= DAY_MAX_DAYS:
+        return "day"
+    if days <= WEEK_MAX_DAYS:
+        return "week"
+    return "month"
+
+
+def _period_sql(column, period):
+    # SQL expression for the first day of the day / week (Monday) / month.
+    if period == "day":
+        return column
+    if BACKEND == "sqlite":
+        if period == "week":
+            return f"date({column}, 'weekday 0', '-6 days')"
+        return f"date({column}, 'start of month')"
+    if period == "week":
+        return f"DATE_SUB({column}, INTERVAL WEEKDAY({column}) DAY)"
+    return f"DATE_SUB({column}, INTERVAL DAYOFMONTH({column}) - 1 DAY)"
+
+
+def sales_series(start_date, end_date, supplier, period=None):
+    # Units sold per period, grouped in SQL from the daily_sales_summary rollup.
+    # period defaults to granularity(start_date, end_date).
+    period = period or granularity(start_date, end_date)
+    where, params = _rollup_filters(start_date, end_date, supplier)
+    # Per day first, which follows the rollup's (sale_date, med_id) key; the
+    # week / month buckets are then computed for a few hundred rows only.
+    bucket = _period_sql("daily.sale_date", period)
+    df = read_sql(f"""
+        SELECT {bucket} AS period, SUM(daily.qty) AS quantity_sold
+        FROM (
+            SELECT d.sale_date, SUM(d.qty) AS qty
+            FROM {DAILY_SALES_SOURCE} d
+            WHERE {where}
+            GROUP BY d.sale_date
+        ) daily
+        GROUP BY {bucket}
+        ORDER BY period
+    """, params)
+    df["period"] = pd.to_datetime(df["period"])
+    return df
+
+
+def top_sellers(start_date, end_date, supplier, limit=10):
+    where, params = _rollup_filters(start_date, end_date, supplier)
+    # Summed per batch before the join, so names are looked up once per batch.
+    return read_sql(f"""
+        SELECT m.name AS medicine_name, SUM(b.qty) AS quantity_sold
+        FROM (
+            SELECT d.med_id, SUM(d.qty) AS qty
+            FROM {DAILY_SALES_SOURCE} d
+            WHERE {where}
+            GROUP BY d.med_id
+        ) b
+        JOIN medicines m ON m.med_id = b.med_id
+        GROUP BY m.name
+        ORDER BY quantity_sold DESC
+        LIMIT %s
+    """, params + [limit])
+
+
+def _read_inventory(as_of, supplier, status, select, tail="", select_params=(), tail_params=()):
+    # Runs SELECT {select} over the batches on hand at the end of as_of, from
+    # the stock ledger (snapshot plus movements), filtered in SQL.
+    where = ["on_hand.quantity <> 0"]
+    params = []
+    if supplier != "All":
+        where.append("sup.name = %s")
+        params.append(supplier)
+    if status:
+        status_clause, status_clause_params = status_filter_sql(status, "m.expiry_date", today=as_of)
+        where.append(status_clause)
+        params += status_clause_params
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            source, source_params = stock_ledger.on_hand_source(cursor, as_of)
+        finally:
+            cursor.close()
+        return pd.read_sql(f"""
+            SELECT {select}
+            FROM {source}
+            JOIN medicines m ON m.med_id = on_hand.med_id
+            LEFT JOIN suppliers sup ON sup.supplier_id = m.supplier_id
+            WHERE {' AND '.join(where)}
+            {tail}
+        """, conn, params=[*select_params, *source_params, *params, *tail_params])
+    finally:
+        conn.close()
+
+
+def inventory(as_of, supplier, status, limit=PAGE_SIZES[0], offset=0):
+    # One page of batches on hand, earliest expiry first, with expiry status
+    # as of that day.
+    status_sql, status_params = status_case_sql("m.expiry_date", today=as_of)
+    df = _read_inventory(
+        as_of, supplier, status,
+        f"""m.med_id, m.name, m.category, on_hand.quantity, m.price, m.expiry_date, m.added_on,
+            sup.name AS supplier_name, {status_sql} AS status""",
+        "ORDER BY m.expiry_date, m.med_id LIMIT %s OFFSET %s",
+        status_params, [min(limit, MAX_PAGE_SIZE), offset],
+    )
+    df["expiry_date"] = pd.to_datetime(df["expiry_date"])
+    df["added_on"] = pd.to_datetime(df["added_on"])
+    return df
+
+
+def inventory_count(as_of, supplier, status):
+    # Number of batches on hand, for paging the inventory table.
+    return int(_read_inventory(as_of, supplier, status, "COUNT(*) AS n")["n"].iloc[0])
+
+
+def inventory_by_category(as_of, supplier, status):
+    return _read_inventory(as_of, supplier, status, "m.category, SUM(on_hand.quantity) AS quantity",
+                           "GROUP BY m.category ORDER BY quantity DESC")
+
+
+def sales_total(start_date, end_date, supplier):
+    # Units sold in the range, summed in SQL from the rollup.
+    where, params = _rollup_filters(start_date, end_date, supplier)
+    total = read_sql(f"SELECT COALESCE(SUM(d.qty), 0) AS total FROM {DAILY_SALES_SOURCE} d WHERE {where}",
+                     params)["total"].iloc[0]
+    return int(total)
+
+
+def stock_kpis(supplier):
+    # Store-wide stock figures: total and sellable units and the number of
+    # medicines with no sellable stock. Read from the medicine_stock summary
+    # (one row per medicine); a supplier filter sums only that supplier's batches.
+    if supplier == "All":
+        source, params = stock_source()
+    else:
+        today = date.today()
+        source = """(
+            SELECT m.name, SUM(m.quantity) AS total_qty,
+                   SUM(CASE WHEN m.quantity > 0 AND m.expiry_date >= %s THEN m.quantity ELSE 0 END) AS sellable_qty
+            FROM medicines m
+            WHERE m.supplier_id IN (SELECT supplier_id FROM suppliers WHERE name = %s)
+            GROUP BY m.name
+        ) stock"""
+        params = [today, supplier]
+    row = read_sql(f"""
+        SELECT COALESCE(SUM(total_qty), 0) AS total_qty,
+               COALESCE(SUM(sellable_qty), 0) AS sellable_qty,
+               COALESCE(SUM(CASE WHEN sellable_qty <= 0 THEN 1 ELSE 0 END), 0) AS out_of_stock
+        FROM {source}
+    """, params).iloc[0]
+    return {key: int(value) for key, value in row.items()}
+
+
+def supplier_costs(start_dt, end_dt, supplier):
+    # One row per supplier: stock value of batches added in the range and units
+    # sold in the range, each aggregated on its own before the join.
+    params = [start_dt, end_dt, start_dt.date(), end_dt.date()]
+    where = "(c.total_cost IS NOT NULL OR u.units_sold IS NOT NULL)"
+    if supplier != "All":
+        where += " AND sup.name = %s"
+        params.append(supplier)
+    return read_sql(f"""
+        SELECT sup.name AS Supplier,
+               COALESCE(c.total_cost, 0) AS Total_Cost,
+               COALESCE(u.units_sold, 0) AS Units_Sold
+        FROM suppliers sup
+        LEFT JOIN (
+            SELECT supplier_id, ROUND(SUM(quantity * price), 2) AS total_cost
+            FROM medicines
+            WHERE added_on BETWEEN %s AND %s
+            GROUP BY supplier_id
+        ) c ON c.supplier_id = sup.supplier_id
+        LEFT JOIN (
+            SELECT m.supplier_id, SUM(d.qty) AS units_sold
+            FROM {DAILY_SALES_SOURCE} d
+            JOIN medicines m ON m.med_id = d.med_id
+            WHERE d.sale_date BETWEEN %s AND %s
+            GROUP BY m.supplier_id
+        ) u ON u.supplier_id = sup.supplier_id
+        WHERE {where}
+        ORDER BY Total_Cost DESC
+    """, params)
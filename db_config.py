@@ -1,10 +1,317 @@
 # db_config.py
-import mysql.connector
+import atexit
+import configparser
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import query_log
+
+# === Settings ===
+# Values come from an optional INI file (section [database] / [pool]) and are
+# overridden by environment variables, e.g.
+#   MEDINV_DB_BACKEND (mysql | sqlite), MEDINV_DB_PATH (sqlite file)
+#   MEDINV_DB_HOST, MEDINV_DB_PORT, MEDINV_DB_USER, MEDINV_DB_PASSWORD, MEDINV_DB_NAME
+#   MEDINV_POOL_SIZE, MEDINV_POOL_TIMEOUT, MEDINV_POOL_IDLE_SECONDS, MEDINV_POOL_PING_AFTER
+#   MEDINV_QUERY_LOG_ENABLED, MEDINV_QUERY_LOG_SLOW_MS, MEDINV_QUERY_LOG_EXPLAIN,
+#   MEDINV_QUERY_LOG_LOG_FILE, MEDINV_QUERY_LOG_STATS_FILE (see query_log.py)
+CONFIG_FILE = os.environ.get(
+    "MEDINV_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.ini")
+)
+
+_DEFAULTS = {
+    "database": {
+        "backend": "mysql",
+        "path": "medicine_inventory.db",
+        "host": "localhost",
+        "port": "3306",
+        "user": "root",
+        "password": "",
+        "name": "medicine_inventory",
+    },
+    "pool": {
+        "size": "5",            # max open connections
+        "timeout": "10",        # seconds to wait for a free connection
+        "idle_seconds": "300",  # close connections idle longer than this
+        "ping_after": "30",     # health-check connections idle longer than this
+    },
+    "query_log": {
+        "enabled": "0",         # instrument every cursor handed out by the pool
+        "slow_ms": "200",       # log statements at least this slow
+        "explain": "0",         # add the EXPLAIN plan to slow SELECTs
+        "log_file": "",         # slow-query log file (default: stderr)
+        "stats_file": "",       # write per-statement stats here on exit ("-" = print to stderr)
+    },
+}
+
+_ENV_PREFIXES = {"database": "DB", "pool": "POOL", "query_log": "QUERY_LOG"}
+
+
+def _load_settings():
+    parser = configparser.ConfigParser()
+    parser.read_dict(_DEFAULTS)
+    parser.read(CONFIG_FILE)
+
+    settings = {}
+    for section, keys in _DEFAULTS.items():
+        for key in keys:
+            env_name = f"MEDINV_{_ENV_PREFIXES[section]}_{key.upper()}"
+            settings[f"{section}.{key}"] = os.environ.get(env_name, parser.get(section, key))
+    return settings
+
+
+SETTINGS = _load_settings()
+
+BACKEND = SETTINGS["database.backend"].lower()
+if BACKEND not in ("mysql", "sqlite"):
+    raise ValueError(f"Unsupported database backend {BACKEND!r} (expected mysql or sqlite)")
+
+DB_SETTINGS = {
+    "host": SETTINGS["database.host"],
+    "port": int(SETTINGS["database.port"]),
+    "user": SETTINGS["database.user"],
+    "password": SETTINGS["database.password"],
+    "database": SETTINGS["database.name"],
+}
+
+query_log.configure(
+    enabled=SETTINGS["query_log.enabled"].lower() in ("1", "true", "yes", "on"),
+    slow_ms=float(SETTINGS["query_log.slow_ms"]),
+    explain=SETTINGS["query_log.explain"].lower() in ("1", "true", "yes", "on"),
+    log_file=SETTINGS["query_log.log_file"],
+    stats_file=SETTINGS["query_log.stats_file"],
+    backend=BACKEND,
+)
+
+
+def _connect():
+    if BACKEND == "sqlite":
+        import sqlite_backend
+        return sqlite_backend.connect(SETTINGS["database.path"])
+
+    import mysql.connector
+    return mysql.connector.connect(**DB_SETTINGS)
+
+
+def _is_healthy(raw_conn):
+    try:
+        return raw_conn.is_connected()
+    except Exception:
+        return False
+
+
+def _close_quietly(raw_conn):
+    try:
+        raw_conn.close()
+    except Exception:
+        pass
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# === Pool ===
+class PooledConnection:
+    # Thin proxy around a driver connection: close() hands it back to the pool
+    # instead of tearing down the socket, everything else is delegated.
+
+    def __init__(self, pool, raw_conn):
+        self._pool = pool
+        self._raw = raw_conn
+        self._cursors = set()  # instrumented cursors not closed yet
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(raw, name)
+
+    def cursor(self, *args, **kwargs):
+        if self._raw is None:
+            raise AttributeError("connection already returned to pool (cursor)")
+        cursor = self._raw.cursor(*args, **kwargs)
+        if not query_log.enabled():
+            return cursor
+        cursor = query_log.InstrumentedCursor(self._raw, cursor, on_close=self._cursors.discard)
+        self._cursors.add(cursor)
+        return cursor
+
+    def close(self):
+        # Statements on cursors the caller never closed are still recorded.
+        for cursor in list(self.__dict__.get("_cursors", ())):
+            cursor._finish()
+        self._cursors = set()
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # A caller that forgot close() must not leak a pool slot.
+        if self.__dict__.get("_raw") is not None:
+            self.close()
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, timeout=10.0, idle_seconds=300.0, ping_after=30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # (raw_conn, last_used) - most recently used last
+        self._open = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "evicted_idle": 0,
+            "health_failures": 0,
+        }
+
+    def _evict_idle(self, now):
+        keep = []
+        for raw, last_used in self._idle:
+            if now - last_used > self.idle_seconds:
+                _close_quietly(raw)
+                self._open -= 1
+                self._stats["evicted_idle"] += 1
+            else:
+                keep.append((raw, last_used))
+        self._idle = keep
+
+    def acquire(self):
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            self._evict_idle(start)
+            while True:
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    raw, last_used = None, None
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"no database connection free after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - start
+
+        # Connect / health-check outside the lock so other threads are not blocked on I/O.
+        if raw is not None and time.monotonic() - last_used > self.ping_after and not _is_healthy(raw):
+            _close_quietly(raw)
+            with self._cond:
+                self._stats["health_failures"] += 1
+            raw = None
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["created"] += 1
+
+        if query_log.enabled():
+            query_log.record_acquire(time.monotonic() - start)
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        # Discard anything the caller left uncommitted so the next user starts clean.
+        try:
+            raw.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+
+        with self._cond:
+            if reusable:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                _close_quietly(raw)
+                self._open -= 1
+            self._cond.notify()
+
+    def resize(self, size):
+        with self._cond:
+            self.size = size
+            self._cond.notify_all()
+
+    def close_all(self):
+        with self._cond:
+            for raw, _ in self._idle:
+                _close_quietly(raw)
+            self._open -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+            })
+        return stats
+
+
+_pool = ConnectionPool(
+    _connect,
+    size=int(SETTINGS["pool.size"]),
+    timeout=float(SETTINGS["pool.timeout"]),
+    idle_seconds=float(SETTINGS["pool.idle_seconds"]),
+    ping_after=float(SETTINGS["pool.ping_after"]),
+)
+atexit.register(_pool.close_all)
+
 
 def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="Shriradhe03#",     # Replace with your MySQL password
-        database="medicine_inventory" # This DB will be created in the next step
-    )
+    # Returns a pooled connection; conn.close() gives it back to the pool.
+    return _pool.acquire()
+
+
+@contextmanager
+def connection():
+    conn = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def set_pool_size(size):
+    _pool.resize(size)
+
+
+def pool_stats():
+    return _pool.stats()
+
+
+def pool_stats_text():
+    # Prometheus text exposition format, for scraping.
+    lines = []
+    for key, value in sorted(pool_stats().items()):
+        lines.append(f"medinv_db_pool_{key} {value}")
+    return "\n".join(lines) + "\n"
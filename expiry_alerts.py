@@ -0,0 +1,193 @@
+# expiry_alerts.py
+# Incremental expiry alerts. Each run raises an alert (expiry_alerts, one per
+# batch and status) for batches with stock that became NEAR EXPIRY or EXPIRED
+# since the previous run, instead of rescanning every batch:
+#
+#   - batches whose expiry date crossed a boundary between checked_through and
+#     today, read as two ranges of idx_medicines_expiry:
+#       expired       checked_through <= expiry_date < today
+#       near expiry   checked_through + N < expiry_date <= today + N
+#   - batches added since the last run (med_id > last_med_id) that are already
+#     near expiry or expired. As in rollup.py the med_id mark trails one run
+#     behind, so a batch committed after a higher med_id is not skipped.
+#
+# The first run has no watermark and alerts on the whole backlog. With
+# --quarantine, expired stock that was alerted on is taken out of
+# medicines.quantity (a 'quarantine' movement in the stock ledger, the units
+# kept in expiry_alerts.quarantined_qty), so it no longer counts as stock.
+#
+#   python expiry_alerts.py run --quarantine              # from cron, e.g. daily at 00:05
+#   python expiry_alerts.py run --every 3600 --quarantine # long-running
+#   python expiry_alerts.py list --days 7
+#   python expiry_alerts.py quarantine                    # every expired alert with stock left
+
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import stock_ledger
+from db_config import get_connection
+from expiry_status import EXPIRED, expiry_bounds, status_case_sql
+
+STATE_NAME = "expiry"
+
+_ALERT_INSERT = """
+    INSERT IGNORE INTO expiry_alerts (med_id, status, expiry_date, quantity, alerted_on)
+    SELECT med_id, {status_sql}, expiry_date, quantity, %s
+    FROM medicines
+    WHERE quantity > 0 AND {where}
+"""
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _load_state(cursor):
+    cursor.execute(
+        "SELECT checked_through, last_med_id, pending_med_id FROM expiry_alert_state WHERE name = %s FOR UPDATE",
+        (STATE_NAME,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise RuntimeError("expiry_alert_state is missing; run migrations.py first.")
+    through, last_med_id, pending_med_id = row
+    return _as_date(through), last_med_id, pending_med_id
+
+
+def _quarantine(cursor, today, where="", params=()):
+    # Moves the stock of expired, alerted batches out of medicines.quantity;
+    # returns (batches, units).
+    cursor.execute(f"""
+        SELECT m.med_id, m.quantity
+        FROM expiry_alerts a
+        JOIN medicines m ON m.med_id = a.med_id
+        WHERE a.status = %s AND m.quantity > 0 AND m.expiry_date < %s {where}
+        FOR UPDATE
+    """, [EXPIRED, today, *params])
+    rows = cursor.fetchall()
+    if not rows:
+        return 0, 0
+    placeholders = ", ".join(["%s"] * len(rows))
+    cursor.execute(f"UPDATE medicines SET quantity = 0 WHERE med_id IN ({placeholders})",
+                   [med_id for med_id, _ in rows])
+    cursor.executemany(
+        "UPDATE expiry_alerts SET quarantined_qty = quarantined_qty + %s WHERE med_id = %s AND status = %s",
+        [(qty, med_id, EXPIRED) for med_id, qty in rows],
+    )
+    stock_ledger.record(cursor, [(med_id, -qty) for med_id, qty in rows], stock_ledger.QUARANTINE)
+    return len(rows), sum(qty for _, qty in rows)
+
+
+def run(conn, today=None, days=None, quarantine=False):
+    # One incremental pass; returns {"alerts", "quarantined_batches", "quarantined_units"}.
+    today, near_limit = expiry_bounds(today, days)
+    days = (near_limit - today).days
+    # Whole seconds, as stored in alerted_on, so this run's alerts match it below.
+    now = datetime.now().replace(microsecond=0)
+    cursor = conn.cursor()
+    try:
+        through, last_med_id, pending_med_id = _load_state(cursor)
+        status_sql, status_params = status_case_sql("expiry_date", today, days)
+
+        ranges = [("med_id > %s AND expiry_date <= %s", [last_med_id, near_limit])]
+        if through is None:
+            ranges.append(("expiry_date <= %s", [near_limit]))
+        elif through < today:
+            ranges.append(("expiry_date >= %s AND expiry_date < %s", [through, today]))
+            ranges.append(("expiry_date > %s AND expiry_date <= %s", [through + timedelta(days=days), near_limit]))
+        alerts = 0
+        for where, params in ranges:
+            cursor.execute(_ALERT_INSERT.format(status_sql=status_sql, where=where),
+                           status_params + [now] + params)
+            alerts += cursor.rowcount
+
+        batches = units = 0
+        if quarantine:
+            batches, units = _quarantine(cursor, today, "AND a.alerted_on = %s", [now])
+
+        cursor.execute("SELECT COALESCE(MAX(med_id), 0) FROM medicines")
+        high = cursor.fetchone()[0]
+        cursor.execute("""
+            UPDATE expiry_alert_state
+            SET checked_through = %s, last_med_id = %s, pending_med_id = %s
+            WHERE name = %s
+        """, (max(today, through or today), max(pending_med_id, last_med_id), max(high, pending_med_id),
+              STATE_NAME))
+        conn.commit()
+        return {"alerts": alerts, "quarantined_batches": batches, "quarantined_units": units}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def quarantine_expired(conn, today=None):
+    # Quarantines every expired batch with an alert and stock left, e.g. after
+    # runs without --quarantine; returns (batches, units).
+    cursor = conn.cursor()
+    try:
+        result = _quarantine(cursor, today or date.today())
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def recent_alerts(conn, since):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT a.alerted_on, a.status, a.med_id, m.name, a.expiry_date, a.quantity, a.quarantined_qty
+            FROM expiry_alerts a
+            JOIN medicines m ON m.med_id = a.med_id
+            WHERE a.alerted_on >= %s
+            ORDER BY a.alerted_on DESC, a.alert_id DESC
+        """, (since,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raise expiry alerts for batches crossing a boundary.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="raise alerts since the last run")
+    run_parser.add_argument("--quarantine", action="store_true", help="take expired stock out of quantity")
+    run_parser.add_argument("--every", type=float, metavar="SECONDS", help="keep running, one pass per interval")
+    list_parser = sub.add_parser("list", help="show recent alerts")
+    list_parser.add_argument("--days", type=int, default=1, help="alerts raised in the last N days")
+    sub.add_parser("quarantine", help="quarantine every expired batch with an alert and stock left")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.command == "run":
+            while True:
+                result = run(conn, quarantine=args.quarantine)
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {result['alerts']} new alerts, "
+                      f"{result['quarantined_units']} units in {result['quarantined_batches']} batches quarantined.")
+                if not args.every:
+                    break
+                time.sleep(args.every)
+        elif args.command == "list":
+            rows = recent_alerts(conn, datetime.now() - timedelta(days=args.days))
+            for alerted_on, status, med_id, name, expiry, qty, quarantined in rows:
+                print(f"{alerted_on}  {status:<12} {med_id:<7} {name:<25} {expiry}  qty {qty:<6} "
+                      f"quarantined {quarantined}")
+            print(f"{len(rows)} alerts.")
+        elif args.command == "quarantine":
+            batches, units = quarantine_expired(conn)
+            print(f"Quarantined {units} units in {batches} batches.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
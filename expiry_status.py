@@ -0,0 +1,57 @@
+# expiry_status.py
+# Single definition of the EXPIRED / NEAR EXPIRY / OK batch classification,
+# as SQL (for queries and WHERE filters) and vectorized for DataFrames.
+
+import os
+from datetime import datetime, timedelta
+
+EXPIRED = "EXPIRED"
+NEAR_EXPIRY = "NEAR EXPIRY"
+OK = "OK"
+STATUSES = [EXPIRED, NEAR_EXPIRY, OK]
+
+# Days ahead of today that count as "near expiry".
+NEAR_EXPIRY_DAYS = int(os.environ.get("MEDINV_NEAR_EXPIRY_DAYS", "30"))
+
+
+def expiry_bounds(today=None, days=None):
+    today = today or datetime.today().date()
+    days = NEAR_EXPIRY_DAYS if days is None else days
+    return today, today + timedelta(days=days)
+
+
+def status_case_sql(column="expiry_date", today=None, days=None):
+    # Returns (sql, params) for a CASE expression yielding the status label.
+    today, near_limit = expiry_bounds(today, days)
+    sql = (f"CASE WHEN {column} < %s THEN '{EXPIRED}' "
+           f"WHEN {column} <= %s THEN '{NEAR_EXPIRY}' ELSE '{OK}' END")
+    return sql, [today, near_limit]
+
+
+def status_filter_sql(status, column="expiry_date", today=None, days=None):
+    # Returns (clause, params) selecting rows with the given status. Uses plain
+    # range predicates rather than the CASE so an index on the column applies.
+    today, near_limit = expiry_bounds(today, days)
+    if status == EXPIRED:
+        return f"{column} < %s", [today]
+    if status == NEAR_EXPIRY:
+        return f"{column} BETWEEN %s AND %s", [today, near_limit]
+    if status == OK:
+        return f"{column} > %s", [near_limit]
+    raise ValueError(f"Unknown status {status!r}, expected one of {', '.join(STATUSES)}")
+
+
+def status_series(expiry_dates, today=None, days=None):
+    # Vectorized classification of a Series of dates (date, datetime or string);
+    # a missing date is OK, as in the SQL CASE.
+    import numpy as np
+    import pandas as pd
+
+    today, near_limit = expiry_bounds(today, days)
+    dates = pd.to_datetime(pd.Series(expiry_dates))
+    labels = np.select(
+        [dates < pd.Timestamp(today), dates <= pd.Timestamp(near_limit)],
+        [EXPIRED, NEAR_EXPIRY],
+        default=OK,
+    )
+    return pd.Series(labels, index=dates.index)
@@ -0,0 +1,278 @@
+# exporters.py
+# Streaming CSV / Parquet exports of sales and inventory. Rows are read with an
+# unbuffered (server-side) cursor in chunks and written as they arrive, so
+# memory use does not grow with the table.
+#
+#   python exporters.py sales sales.csv.gz --from 2024-01-01 --to 2024-12-31
+#   python exporters.py sales sales.csv --resume          # continue after the last exported sale_id
+#   python exporters.py inventory inventory.parquet --compression zstd
+#
+# Parquet needs pyarrow; zstd-compressed CSV needs the zstandard package.
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import time
+
+from db_config import get_connection
+from expiry_status import status_case_sql
+
+DEFAULT_CHUNKSIZE = 10000
+
+SALES_QUERY = """
+    SELECT
+        s.sale_id,
+        m.name AS medicine_name,
+        m.manufacturer,
+        s.quantity_sold,
+        s.sale_date
+    FROM sales s
+    JOIN medicines m ON s.med_id = m.med_id
+    {where}
+    ORDER BY s.sale_id ASC
+"""
+
+INVENTORY_COLUMNS = ["med_id", "name", "category", "manufacturer", "quantity", "price",
+                     "expiry_date", "added_on", "status"]
+
+INVENTORY_QUERY = """
+    SELECT med_id, name, category, manufacturer, quantity, price, expiry_date, added_on,
+           {status_sql} AS status
+    FROM medicines
+    ORDER BY name ASC, expiry_date ASC
+"""
+
+
+# === Reading ===
+def iter_chunks(query, params=(), chunksize=DEFAULT_CHUNKSIZE):
+    # Yields (column_names, rows) per chunk from an unbuffered cursor.
+    conn = get_connection()
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        columns = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def sales_chunks(date_from=None, date_to=None, after_sale_id=None, chunksize=DEFAULT_CHUNKSIZE):
+    clauses, params = [], []
+    if date_from:
+        clauses.append("s.sale_date >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append("s.sale_date <= %s")
+        params.append(date_to)
+    if after_sale_id:
+        clauses.append("s.sale_id > %s")
+        params.append(after_sale_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return iter_chunks(SALES_QUERY.format(where=where), params, chunksize)
+
+
+def inventory_chunks(chunksize=DEFAULT_CHUNKSIZE):
+    status_sql, status_params = status_case_sql()
+    return iter_chunks(INVENTORY_QUERY.format(status_sql=status_sql), status_params, chunksize)
+
+
+# === Writing ===
+def _open_text(path, compression, append):
+    mode = "at" if append else "wt"
+    if compression == "gzip":
+        return gzip.open(path, mode, newline="", encoding="utf-8")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd compression needs the 'zstandard' package (pip install zstandard).")
+        raw = open(path, "ab" if append else "wb")
+        writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, newline="", encoding="utf-8")
+    return open(path, "a" if append else "w", newline="", encoding="utf-8")
+
+
+def write_csv(path, chunks, compression=None, append=False, on_chunk=None):
+    rows_written = 0
+    with _open_text(path, compression, append) as f:
+        # LF line endings, like the pandas to_csv reports.
+        writer = csv.writer(f, lineterminator="\n")
+        header_done = append
+        for columns, rows in chunks:
+            if not header_done:
+                writer.writerow(columns)
+                header_done = True
+            writer.writerows(rows)
+            rows_written += len(rows)
+            if on_chunk:
+                f.flush()
+                on_chunk(columns, rows)
+    return rows_written
+
+
+def _arrow_schema(pa, columns):
+    # Declared rather than inferred from the first chunk, where an all-NULL
+    # column would come out as null and a later chunk would not fit it.
+    types = {
+        "sale_id": pa.int64(), "med_id": pa.int64(),
+        "quantity_sold": pa.int64(), "quantity": pa.int64(),
+        "price": pa.float64(),
+        "sale_date": pa.date32(), "expiry_date": pa.date32(),
+        "added_on": pa.timestamp("us"),
+    }
+    return pa.schema([pa.field(col, types.get(col, pa.string())) for col in columns])
+
+
+def _arrow_column(pa, values, field):
+    if pa.types.is_floating(field.type):
+        values = [None if v is None else float(v) for v in values]  # Decimal from MySQL
+    elif pa.types.is_string(field.type):
+        values = [None if v is None else str(v) for v in values]
+    return pa.array(values, type=field.type)
+
+
+def write_parquet(path, chunks, compression=None, on_chunk=None):
+    # One row group per chunk.
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet export needs the 'pyarrow' package (pip install pyarrow).")
+
+    writer = None
+    schema = None
+    rows_written = 0
+    try:
+        for columns, rows in chunks:
+            if writer is None:
+                schema = _arrow_schema(pa, columns)
+                writer = pq.ParquetWriter(path, schema, compression=compression or "snappy")
+            table = pa.Table.from_arrays(
+                [_arrow_column(pa, [row[i] for row in rows], field) for i, field in enumerate(schema)],
+                schema=schema)
+            writer.write_table(table, row_group_size=len(rows))
+            rows_written += len(rows)
+            if on_chunk:
+                on_chunk(columns, rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows_written
+
+
+def detect_format(path):
+    # Returns (format, compression) from the file extension.
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        return "parquet", None
+    if lower.endswith(".gz"):
+        return "csv", "gzip"
+    if lower.endswith(".zst"):
+        return "csv", "zstd"
+    return "csv", None
+
+
+# === Resumable sales export ===
+def _checkpoint_path(path):
+    return path + ".checkpoint"
+
+
+def _read_checkpoint(path):
+    try:
+        with open(_checkpoint_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path, last_sale_id, rows):
+    tmp = _checkpoint_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"last_sale_id": last_sale_id, "rows": rows}, f)
+    os.replace(tmp, _checkpoint_path(path))
+
+
+def export_sales(path, fmt=None, compression=None, date_from=None, date_to=None,
+                 after_sale_id=None, resume=False, chunksize=DEFAULT_CHUNKSIZE, checkpoint=True):
+    # Exports sales in sale_id order. A checkpoint file next to the output
+    # records the last sale_id written, so --resume continues after a crash or
+    # picks up only new sales on the next run.
+    detected_fmt, detected_compression = detect_format(path)
+    fmt = fmt or detected_fmt
+    compression = compression or detected_compression
+
+    state = {"last_sale_id": after_sale_id or 0, "rows": 0}
+    append = False
+    if resume:
+        saved = _read_checkpoint(path)
+        if saved:
+            state = saved
+            append = os.path.exists(path)
+    if fmt == "parquet" and append:
+        # Parquet files cannot be appended to; continue in a new part file.
+        root, ext = os.path.splitext(path)
+        target = f"{root}.after-{state['last_sale_id']}{ext}"
+        append = False
+    else:
+        target = path
+
+    def on_chunk(columns, rows):
+        state["last_sale_id"] = rows[-1][columns.index("sale_id")]
+        state["rows"] += len(rows)
+        if checkpoint:
+            _write_checkpoint(path, state["last_sale_id"], state["rows"])
+
+    chunks = sales_chunks(date_from, date_to, state["last_sale_id"], chunksize)
+    if fmt == "parquet":
+        written = write_parquet(target, chunks, compression, on_chunk)
+    else:
+        written = write_csv(target, chunks, compression, append, on_chunk)
+    return {"path": target, "rows": written, "last_sale_id": state["last_sale_id"]}
+
+
+def export_inventory(path, fmt=None, compression=None, chunksize=DEFAULT_CHUNKSIZE):
+    detected_fmt, detected_compression = detect_format(path)
+    fmt = fmt or detected_fmt
+    compression = compression or detected_compression
+    chunks = inventory_chunks(chunksize)
+    if fmt == "parquet":
+        written = write_parquet(path, chunks, compression)
+    else:
+        written = write_csv(path, chunks, compression)
+    return {"path": path, "rows": written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming sales / inventory export.")
+    parser.add_argument("what", choices=["sales", "inventory"])
+    parser.add_argument("path", help="output file (.csv, .csv.gz, .csv.zst or .parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="override format from extension")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "snappy"],
+                        help="override compression from extension (snappy: parquet only)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per fetch / row group")
+    parser.add_argument("--from", dest="date_from", help="sales from date YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="sales up to date YYYY-MM-DD")
+    parser.add_argument("--after-sale-id", type=int, help="only sales with a higher sale_id")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of a previous run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.what == "sales":
+        result = export_sales(args.path, args.format, args.compression, args.date_from, args.date_to,
+                              args.after_sale_id, args.resume, args.chunksize)
+    else:
+        result = export_inventory(args.path, args.format, args.compression, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {result['rows']} rows to {result['path']} in {elapsed:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# generate_data.py
+# Synthetic inventory/sales data at configurable volume, loaded in bulk.
+#
+#   python generate_data.py --batches 100000 --sales 10000000 --suppliers 2000
+#
+# Product popularity follows a Zipf-like curve (a few medicines take most of
+# the sales), expiry dates spread from recently expired to two years out, and
+# sales dates cover --days of history. Generated sales are history only: they
+# do not decrement batch stock.
+
+import argparse
+import itertools
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import rollup
+import stock_ledger
+from db_config import get_connection
+from init_db import create_tables
+
+CATEGORIES = [
+    "Painkiller", "Antibiotic", "Antihistamine", "Anti-inflammatory", "Antacid",
+    "Antidiabetic", "Antihypertensive", "Vitamin", "Antifungal", "Antiviral",
+]
+MANUFACTURERS = ["Cipla", "Sun Pharma", "Alkem", "Pfizer", "Zydus", "Lupin", "Mankind", "Abbott"]
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _insert_many(conn, sql, rows, chunk_size):
+    cursor = conn.cursor()
+    for chunk in _chunks(rows, chunk_size):
+        cursor.executemany(sql, chunk)
+        conn.commit()
+    cursor.close()
+
+
+def _zipf_cum_weights(n, skew):
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def generate(batches=10000, sales=100000, suppliers=200, products=None, days=365,
+             skew=1.1, chunk_size=10000, seed=42):
+    rng = random.Random(seed)
+    products = products or max(1, batches // 5)
+    today = date.today()
+    added_on = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    start = time.perf_counter()
+
+    create_tables()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        # Suppliers
+        _insert_many(conn, "INSERT INTO suppliers (name, contact_info) VALUES (%s, %s)",
+                     [(f"Supplier {i:05d}", f"supplier{i}@example.com") for i in range(1, suppliers + 1)],
+                     chunk_size)
+        cursor.execute("SELECT supplier_id FROM suppliers")
+        supplier_ids = [row[0] for row in cursor.fetchall()]
+
+        # Medicine batches: each product gets several batches with distinct expiry dates.
+        catalogue = [
+            (f"Medicine {i:06d}", rng.choice(CATEGORIES), rng.choice(MANUFACTURERS),
+             round(rng.uniform(0.5, 50.0), 2))
+            for i in range(1, products + 1)
+        ]
+        batch_rows = []
+        for i in range(batches):
+            name, category, manufacturer, price = catalogue[i % products]
+            expiry = today + timedelta(days=rng.randint(-60, 730) + i // products)
+            batch_rows.append((name, category, rng.randint(0, 500), price, expiry, manufacturer, added_on))
+        first_new = stock_ledger.max_med_id(cursor)
+        _insert_many(conn, """
+            INSERT IGNORE INTO medicines (name, category, quantity, price, expiry_date, manufacturer, added_on)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, batch_rows, chunk_size)
+        del batch_rows
+        stock_ledger.record_new_batches(cursor, first_new)
+        conn.commit()
+
+        cursor.execute("SELECT med_id FROM medicines")
+        med_ids = [row[0] for row in cursor.fetchall()]
+
+        links = [(med_id, rng.choice(supplier_ids)) for med_id in med_ids]
+        _insert_many(conn, "INSERT IGNORE INTO medicine_supplier (med_id, supplier_id) VALUES (%s, %s)",
+                     links, chunk_size)
+        _insert_many(conn, "UPDATE medicines SET supplier_id = %s WHERE med_id = %s",
+                     [(supplier_id, med_id) for med_id, supplier_id in links], chunk_size)
+        del links
+
+        # Sales: popular batches (by Zipf rank) and a mild recency bias on dates.
+        rng.shuffle(med_ids)
+        cum_weights = _zipf_cum_weights(len(med_ids), skew)
+        sale_cursor = conn.cursor()
+        remaining = sales
+        while remaining > 0:
+            n = min(chunk_size, remaining)
+            picked = rng.choices(med_ids, cum_weights=cum_weights, k=n)
+            rows = [
+                (med_id, rng.randint(1, 10), today - timedelta(days=int(days * rng.random() ** 1.5)))
+                for med_id in picked
+            ]
+            sale_cursor.executemany(
+                "INSERT INTO sales (med_id, quantity_sold, sale_date) VALUES (%s, %s, %s)", rows
+            )
+            conn.commit()
+            remaining -= n
+        sale_cursor.close()
+
+        rollup.rebuild(conn)
+    finally:
+        cursor.close()
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "suppliers": suppliers,
+        "products": products,
+        "batches": len(med_ids),
+        "sales": sales,
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic inventory and sales data.")
+    parser.add_argument("--batches", type=int, default=10000, help="medicine batch rows")
+    parser.add_argument("--sales", type=int, default=100000, help="sales rows")
+    parser.add_argument("--suppliers", type=int, default=200)
+    parser.add_argument("--products", type=int, help="distinct medicine names (default batches/5)")
+    parser.add_argument("--days", type=int, default=365, help="days of sales history")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for sales popularity")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows per insert statement/commit")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    result = generate(args.batches, args.sales, args.suppliers, args.products, args.days,
+                      args.skew, args.chunk_size, args.seed)
+    print(f"Generated {result['batches']} batches of {result['products']} medicines, "
+          f"{result['suppliers']} suppliers and {result['sales']} sales in {result['seconds']}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 # init_db.py
 
-from db_config import get_connection
+from db_config import BACKEND, get_connection
+from migrations import run_migrations, stamp
 
 def create_tables():
     conn = get_connection()
+
+    if BACKEND == "sqlite":
+        import sqlite_backend
+        sqlite_backend.create_schema(conn)
+        stamp(conn, sqlite_backend.SCHEMA_VERSION)
+        print("All tables created successfully.")
+        conn.close()
+        run_migrations()
+        return
+
     cursor = conn.cursor()
 
     # Create medicines table
@@ -55,5 +66,8 @@ def create_tables():
     cursor.close()
     conn.close()
 
+    # Bring the schema (indexes, keys, added columns) up to the latest version.
+    run_migrations()
+
 if __name__ == "__main__":
     create_tables()
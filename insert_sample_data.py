@@ -1,6 +1,7 @@
 # insert_sample_data.py
 
 from db_config import get_connection
+import stock_ledger
 from datetime import date
 
 def insert_sample_data():
@@ -16,10 +17,12 @@ def insert_sample_data():
         ("Ibuprofen", "Anti-inflammatory", 130, 1.80, "2025-10-01", "Zydus")
     ]
 
+    first_new = stock_ledger.max_med_id(cursor)
     cursor.executemany("""
         INSERT INTO medicines (name, category, quantity, price, expiry_date, manufacturer)
         VALUES (%s, %s, %s, %s, %s, %s)
     """, medicines)
+    stock_ledger.record_new_batches(cursor, first_new)
 
     # Insert suppliers
     # suppliers = [
@@ -0,0 +1,221 @@
+# inventory_cache.py
+# In-process cache of hot, read-mostly lookups:
+#   supplier name  -> supplier_id
+#   medicine name  -> its batches in FEFO order
+#
+# Entries are LRU-evicted and expire after MEDINV_CACHE_TTL seconds, so rows
+# written by another process are picked up within that window. Writers in this
+# process update the cache as they commit (write-through). The cache is only
+# trusted for positive answers: a miss, or a batch that is not in the cached
+# list, always goes to the database, and a cached med_id that no longer
+# matches a row is dropped by the caller (see main.add_medicine).
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+CACHE_SIZE = int(os.environ.get("MEDINV_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("MEDINV_CACHE_TTL", "60"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, on_remove=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._on_remove = on_remove
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, stored_at), least recently used first
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _drop(self, key):
+        value, _ = self._data.pop(key)
+        if self._on_remove:
+            self._on_remove(key, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                self._drop(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, time.monotonic())
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self._stats["evictions"] += 1
+
+    def update(self, key, fn):
+        # Replaces a cached value with fn(value) if present; fn returning None drops it.
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return
+            value = fn(entry[0])
+            if value is None:
+                self._drop(key)
+            else:
+                self._data[key] = (value, entry[1])
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._data):
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {**self._stats, "size": len(self._data), "maxsize": self.maxsize,
+                    "hit_ratio": round(self._stats["hits"] / lookups, 3) if lookups else None}
+
+
+# med_id -> medicine name for every cached batch, so a restock by id can find its entry.
+_names_by_med_id = {}
+
+
+def _forget_batches(name, batches):
+    for batch in batches:
+        _names_by_med_id.pop(batch[0], None)
+
+
+suppliers = LRUCache()
+batches = LRUCache(on_remove=_forget_batches)
+
+BATCH_COLUMNS = "med_id, category, quantity, price, expiry_date, manufacturer"
+
+
+# === Suppliers ===
+def supplier_id(cursor, name):
+    # Returns the supplier's id, or None if there is no such supplier.
+    cached = suppliers.get(name)
+    if cached is not _MISSING:
+        return cached
+    cursor.execute("SELECT supplier_id FROM suppliers WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    suppliers.put(name, row[0])
+    return row[0]
+
+
+def remember_supplier(name, new_id):
+    suppliers.put(name, new_id)
+
+
+# === Medicine batches ===
+def _load_batches(cursor, name):
+    cursor.execute(f"""
+        SELECT {BATCH_COLUMNS} FROM medicines
+        WHERE name = %s
+        ORDER BY expiry_date ASC, med_id ASC
+    """, (name,))
+    rows = tuple(tuple(row) for row in cursor.fetchall())
+    batches.put(name, rows)
+    for row in rows:
+        _names_by_med_id[row[0]] = name
+    return rows
+
+
+def medicine_batches(cursor, name):
+    # (med_id, category, quantity, price, expiry_date, manufacturer) per batch, FEFO order.
+    cached = batches.get(name)
+    if cached is not _MISSING:
+        return cached
+    return _load_batches(cursor, name)
+
+
+def _same_batch(row, category, price, expiry, manufacturer):
+    return (row[1] == category and row[5] == manufacturer and row[4] == expiry
+            and round(float(row[3]), 2) == round(float(price), 2))
+
+
+def find_batch(cursor, name, category, price, expiry, manufacturer):
+    # Returns the med_id of the batch with this identity, or None. Only a match
+    # in the cache is trusted; otherwise the database decides, with its own
+    # collation rules.
+    if isinstance(expiry, str):
+        expiry = datetime.strptime(expiry, "%Y-%m-%d").date()
+    for row in medicine_batches(cursor, name):
+        if _same_batch(row, category, price, expiry, manufacturer):
+            return row[0]
+
+    cursor.execute("""
+        SELECT med_id FROM medicines
+        WHERE name = %s AND category = %s AND price = %s
+        AND expiry_date = %s AND manufacturer = %s
+    """, (name, category, price, expiry, manufacturer))
+    row = cursor.fetchone()
+    if row is not None:
+        # Written by another process since the entry was loaded.
+        invalidate_medicine(name)
+        return row[0]
+    return None
+
+
+def add_batch(name, med_id, category, quantity, price, expiry, manufacturer):
+    if isinstance(expiry, str):
+        expiry = datetime.strptime(expiry, "%Y-%m-%d").date()
+    row = (med_id, category, quantity, price, expiry, manufacturer)
+
+    def insert(rows):
+        _names_by_med_id[med_id] = name
+        return tuple(sorted(rows + (row,), key=lambda r: (r[4] or date.max, r[0])))
+
+    batches.update(name, insert)
+
+
+def adjust_quantity(med_id, delta):
+    name = _names_by_med_id.get(med_id)
+    if name is None:
+        return
+
+    def adjust(rows):
+        return tuple((r[0], r[1], r[2] + delta) + r[3:] if r[0] == med_id else r for r in rows)
+
+    batches.update(name, adjust)
+
+
+def apply_allocation(name, allocation):
+    # allocation: [(med_id, quantity_sold, ...), ...] as committed by a sale.
+    sold = {item[0]: item[1] for item in allocation}
+    if not sold:
+        return
+
+    def apply(rows):
+        if not set(sold) <= {r[0] for r in rows}:
+            return None  # the sale used a batch we have not seen; reload next time
+        return tuple((r[0], r[1], r[2] - sold[r[0]]) + r[3:] if r[0] in sold else r for r in rows)
+
+    batches.update(name, apply)
+
+
+def invalidate_medicine(name):
+    batches.invalidate(name)
+
+
+def clear():
+    suppliers.clear()
+    batches.clear()
+
+
+def stats():
+    return {"suppliers": suppliers.stats(), "batches": batches.stats()}
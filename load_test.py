@@ -0,0 +1,215 @@
+# load_test.py
+# Concurrent sale recording against a few hot medicines, followed by
+# invariant checks on stock and sales.
+#
+#   python load_test.py --workers 16 --seconds 30 --hot 5
+#   python load_test.py --workers 8 --processes --seconds 10
+#
+# Exits with status 1 if an invariant is violated. Records real sales, so run
+# it against a copy of the data.
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from datetime import date
+
+import db_config
+from allocation import allocate_sale
+from benchmark import summarize
+from db_config import get_connection
+
+
+def pick_hot_medicines(count):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT name FROM medicines
+            WHERE quantity > 0 AND expiry_date >= %s
+            GROUP BY name
+            ORDER BY SUM(quantity) DESC
+            LIMIT %s
+        """, (date.today(), count))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def snapshot(names):
+    # Stock per batch of the hot medicines plus the current highest sale_id.
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(f"SELECT med_id, quantity FROM medicines WHERE name IN ({placeholders})", names)
+        stock = dict(cursor.fetchall())
+        cursor.execute("SELECT COALESCE(MAX(sale_id), 0) FROM sales")
+        max_sale_id = cursor.fetchone()[0]
+        return stock, max_sale_id
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def sell_loop(names, seconds, max_qty, seed):
+    # One worker: record sales until the deadline. Returns its counters and samples.
+    rng = random.Random(seed)
+    result = {"sales": 0, "units": 0, "empty": 0, "errors": 0, "first_error": None,
+              "latency": [], "lock_wait": []}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        qty = rng.randint(1, max_qty)
+        timings = {}
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = get_connection()
+            allocation = allocate_sale(conn, rng.choice(names), qty, timings=timings)
+            conn.commit()
+        except Exception as e:
+            # Pool timeouts, deadlocks and lock wait timeouts count as failed
+            # sales, not crashes.
+            if conn is not None:
+                conn.rollback()
+            result["errors"] += 1
+            result["first_error"] = result["first_error"] or repr(e)
+            continue
+        finally:
+            if conn is not None:
+                conn.close()
+        result["latency"].append(time.perf_counter() - start)
+        result["lock_wait"].append(timings.get("lock_wait", 0.0))
+        sold = sum(q for _, q, _ in allocation)
+        if sold:
+            result["sales"] += 1
+            result["units"] += sold
+        else:
+            result["empty"] += 1
+    return result
+
+
+def _process_worker(args):
+    return sell_loop(*args)
+
+
+def run_workers(names, workers, seconds, max_qty, processes):
+    seeds = range(1, workers + 1)
+    if processes:
+        # Spawned, not forked: a forked child would inherit the parent's idle
+        # pooled connection and share its socket with every other child.
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            return pool.map(_process_worker, [(names, seconds, max_qty, s) for s in seeds])
+
+    db_config.set_pool_size(max(workers, db_config.pool_stats()["size"]))
+    results = [None] * workers
+
+    def target(i, seed):
+        results[i] = sell_loop(names, seconds, max_qty, seed)
+
+    threads = [threading.Thread(target=target, args=(i, s)) for i, s in enumerate(seeds)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def check_invariants(stock_before, max_sale_id_before, units_reported):
+    conn = get_connection()
+    cursor = conn.cursor()
+    violations = []
+    try:
+        cursor.execute("SELECT COUNT(*) FROM medicines WHERE quantity < 0")
+        negative = cursor.fetchone()[0]
+        if negative:
+            violations.append(f"{negative} batches have negative quantity")
+
+        med_ids = list(stock_before)
+        placeholders = ", ".join(["%s"] * len(med_ids))
+        cursor.execute(f"SELECT med_id, quantity FROM medicines WHERE med_id IN ({placeholders})", med_ids)
+        stock_after = dict(cursor.fetchall())
+        decrease = sum(stock_before[m] - stock_after.get(m, 0) for m in med_ids)
+
+        cursor.execute(f"""
+            SELECT COALESCE(SUM(quantity_sold), 0) FROM sales
+            WHERE sale_id > %s AND med_id IN ({placeholders})
+        """, [max_sale_id_before] + med_ids)
+        sold = int(cursor.fetchone()[0])
+
+        if sold != decrease:
+            violations.append(f"sales rows total {sold} units but stock decreased by {decrease}")
+        if sold != units_reported:
+            violations.append(f"workers reported {units_reported} units but sales rows total {sold}")
+        return violations, {"stock_decrease": decrease, "units_in_sales": sold}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent sale-recording load test.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--hot", type=int, default=3, help="number of hot medicines to contend on")
+    parser.add_argument("--max-qty", type=int, default=5, help="max units per sale")
+    parser.add_argument("--processes", action="store_true", help="use worker processes instead of threads")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    names = pick_hot_medicines(args.hot)
+    if not names:
+        sys.exit("No sellable stock found; run generate_data.py first.")
+    stock_before, max_sale_id_before = snapshot(names)
+
+    start = time.perf_counter()
+    results = run_workers(names, args.workers, args.seconds, args.max_qty, args.processes)
+    elapsed = time.perf_counter() - start
+
+    totals = {key: sum(r[key] for r in results) for key in ("sales", "units", "empty", "errors")}
+    latency = [x for r in results for x in r["latency"]]
+    lock_wait = [x for r in results for x in r["lock_wait"]]
+    violations, checked = check_invariants(stock_before, max_sale_id_before, totals["units"])
+
+    report = {
+        "workers": args.workers,
+        "mode": "processes" if args.processes else "threads",
+        "hot_medicines": names,
+        "seconds": round(elapsed, 3),
+        "sales_per_sec": round(totals["sales"] / elapsed, 1),
+        **totals,
+        "latency": summarize(latency) if latency else None,
+        "lock_wait": summarize(lock_wait) if lock_wait else None,
+        **checked,
+        "violations": violations,
+    }
+
+    print(f"{totals['sales']} sales ({totals['units']} units) in {elapsed:.1f}s "
+          f"= {report['sales_per_sec']} sales/sec with {args.workers} {report['mode']}")
+    print(f"  out of stock: {totals['empty']}, errors: {totals['errors']}")
+    first_error = next((r["first_error"] for r in results if r["first_error"]), None)
+    if first_error:
+        print(f"  first error: {first_error}")
+    if latency:
+        print(f"  sale latency p50 {report['latency']['p50_ms']} ms, p95 {report['latency']['p95_ms']} ms")
+        print(f"  lock wait    p50 {report['lock_wait']['p50_ms']} ms, p95 {report['lock_wait']['p95_ms']} ms")
+    if violations:
+        print("INVARIANT VIOLATIONS:")
+        for v in violations:
+            print(f"  - {v}")
+    else:
+        print("Invariants hold: no negative stock, sales match stock decrease.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
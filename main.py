@@ -1,5 +1,17 @@
 from db_config import get_connection
-from datetime import datetime, timedelta
+from allocation import allocate_sale
+import inventory_cache
+import rollup
+import stock_ledger
+from stock_summary import stock_source
+from expiry_status import STATUSES, status_case_sql, status_filter_sql
+from datetime import datetime
+
+PAGE_SIZE = 20
+
+MEDICINE_COLUMNS = "med_id, name, category, manufacturer, quantity, price, expiry_date, added_on"
+
+STOCK_COLUMNS = "name, sellable_qty, total_qty, batches, earliest_expiry"
 
 def show_menu():
     print("\n=== Medicine Inventory & Sales Management ===")
@@ -8,53 +20,211 @@ def show_menu():
     print("3. Update Medicine Quantity")
     print("4. Record a Sale")
     print("5. View Sales Report")
-    print("6. Exit")
+    print("6. View Stock by Medicine")
+    print("7. Exit")
+
+def _like_prefix(prefix):
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+def _medicine_filters(name_prefix=None, category=None, status=None):
+    clauses, params = [], []
+    if name_prefix:
+        clauses.append("name LIKE %s")
+        params.append(_like_prefix(name_prefix))
+    if category:
+        clauses.append("category = %s")
+        params.append(category)
+    if status:
+        clause, status_params = status_filter_sql(status)
+        clauses.append(clause)
+        params.extend(status_params)
+    return clauses, params
+
+def _after_medicine(clauses, params, after):
+    if after:
+        name, expiry, med_id = after
+        clauses.append("(name > %s OR (name = %s AND (expiry_date > %s OR (expiry_date = %s AND med_id > %s))))")
+        params.extend((name, name, expiry, expiry, med_id))
+
+def fetch_medicines_page(conn, after=None, limit=PAGE_SIZE, name_prefix=None, category=None, status=None):
+    # Keyset pagination on (name, expiry_date, med_id); after is the last row's key.
+    clauses, params = _medicine_filters(name_prefix, category, status)
+    _after_medicine(clauses, params, after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    status_sql, status_params = status_case_sql()
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {MEDICINE_COLUMNS}, {status_sql} AS status
+        FROM medicines
+        {where}
+        ORDER BY name ASC, expiry_date ASC, med_id ASC
+        LIMIT %s
+    """, status_params + params + [limit])
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def iter_medicines(conn, name_prefix=None, category=None, status=None, after=None):
+    # Full dump through an unbuffered cursor: rows stream from the server one at a time.
+    clauses, params = _medicine_filters(name_prefix, category, status)
+    _after_medicine(clauses, params, after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    status_sql, status_params = status_case_sql()
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(f"""
+            SELECT {MEDICINE_COLUMNS}, {status_sql} AS status
+            FROM medicines
+            {where}
+            ORDER BY name ASC, expiry_date ASC, med_id ASC
+        """, status_params + params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+def _print_medicine_header():
+    print("\n=== 📦 Medicine Inventory (Batch-wise) ===")
+    print(f"{'ID':<5} {'Name':<20} {'Category':<25} {'Manufacturer':<15} {'Qty':<6} {'Price':<8} {'Expiry':<12} {'Status':<15} {'added on':<12}")
+    print("-" * 150)
+
+def _print_medicine_row(row):
+    med_id, name, category, manufacturer, qty, price, expiry, added_on, status = row
+    print(f"{med_id:<5} {name:<20} {category:<25} {manufacturer:<15} {qty:<6} ₹{price:<7.2f} {expiry}  {status:<15} {added_on}")
+
+def _prompt_page_action():
+    return input("[Enter] next page, [a] show all remaining, [q] quit: ").strip().lower()
 
 def view_medicines():
+    name_prefix = input("Name starts with (blank for all): ").strip() or None
+    category = input("Category (blank for all): ").strip() or None
+    status = input("Status - EXPIRED / NEAR EXPIRY / OK (blank for all): ").strip().upper() or None
+    if status and status not in STATUSES:
+        print(f"Invalid status. Choose one of: {', '.join(STATUSES)}.")
+        return
+
     conn = get_connection()
+    try:
+        rows = fetch_medicines_page(conn, name_prefix=name_prefix, category=category, status=status)
+        if not rows:
+            print("No medicines found in the inventory.")
+            return
+
+        _print_medicine_header()
+        while rows:
+            for row in rows:
+                _print_medicine_row(row)
+            if len(rows) < PAGE_SIZE:
+                break
+
+            action = _prompt_page_action()
+            after = (rows[-1][1], rows[-1][6], rows[-1][0])
+            if action == "q":
+                break
+            if action == "a":
+                # Stream everything after the current page without holding it in memory.
+                for row in iter_medicines(conn, name_prefix, category, status, after=after):
+                    _print_medicine_row(row)
+                break
+            rows = fetch_medicines_page(conn, after=after,
+                                        name_prefix=name_prefix, category=category, status=status)
+    finally:
+        conn.close()
+
+# === Stock per medicine ===
+# One row per medicine name from the medicine_stock summary, so listing and the
+# low-stock filter cost O(medicines), not O(batches).
+def _stock_query(name_prefix=None, below=None, after=None):
+    source, params = stock_source()
+    clauses = []
+    if name_prefix:
+        clauses.append("name LIKE %s")
+        params.append(_like_prefix(name_prefix))
+    if below is not None:
+        clauses.append("sellable_qty < %s")
+        params.append(below)
+    if after:
+        clauses.append("name > %s")
+        params.append(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"SELECT {STOCK_COLUMNS} FROM {source} {where} ORDER BY name ASC", params
+
+def fetch_stock_page(conn, after=None, limit=PAGE_SIZE, name_prefix=None, below=None):
+    # Keyset pagination on name; after is the last row's name.
+    query, params = _stock_query(name_prefix, below, after)
     cursor = conn.cursor()
+    cursor.execute(f"{query} LIMIT %s", params + [limit])
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
 
-    cursor.execute("""
-        SELECT med_id, name, category, manufacturer, quantity, price, expiry_date, added_on
-        FROM medicines
-        ORDER BY name ASC, expiry_date ASC
-    """)
-
-    results = cursor.fetchall()
-    today = datetime.today().date()
-    near_expiry_limit = today + timedelta(days=30)
-
-    if results:
-        print("\n=== 📦 Medicine Inventory (Batch-wise) ===")
-        print(f"{'ID':<5} {'Name':<20} {'Category':<25} {'Manufacturer':<15} {'Qty':<6} {'Price':<8} {'Expiry':<12} {'Status':<15} {'added on':<12}")
-        print("-" * 150)
-        for med_id, name, category, manufacturer, qty, price, expiry, added_on in results:
-            if expiry < today:
-                status = "EXPIRED"
-            elif today <= expiry <= near_expiry_limit:
-                status = "Near Expiry"
-            else:
-                status = "OK"
-
-            print(f"{med_id:<5} {name:<20} {category:<25} {manufacturer:<15} {qty:<6} ₹{price:<7.2f} {expiry}  {status:<15} {added_on}")
-    else:
-        print("No medicines found in the inventory.")
+def iter_stock(conn, name_prefix=None, below=None, after=None):
+    query, params = _stock_query(name_prefix, below, after)
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
 
-    cursor.close()
-    conn.close()
+def _print_stock_header():
+    print("\n=== 📦 Stock by Medicine ===")
+    print(f"{'Name':<20} {'Sellable':>9} {'Total':>9} {'Batches':>8}  {'Next expiry':<12}")
+    print("-" * 64)
+
+def _print_stock_row(row):
+    name, sellable, total, batches, earliest = row
+    print(f"{name:<20} {sellable:>9} {total:>9} {batches:>8}  {earliest or '-'}")
+
+def view_stock():
+    name_prefix = input("Name starts with (blank for all): ").strip() or None
+    below = input("Only medicines with sellable stock below (blank for all): ").strip()
+    try:
+        below = int(below) if below else None
+    except ValueError:
+        print("Invalid number.")
+        return
+
+    conn = get_connection()
+    try:
+        rows = fetch_stock_page(conn, name_prefix=name_prefix, below=below)
+        if not rows:
+            print("No medicines found.")
+            return
+
+        _print_stock_header()
+        while rows:
+            for row in rows:
+                _print_stock_row(row)
+            if len(rows) < PAGE_SIZE:
+                break
+
+            action = _prompt_page_action()
+            if action == "q":
+                break
+            if action == "a":
+                for row in iter_stock(conn, name_prefix, below, after=rows[-1][0]):
+                    _print_stock_row(row)
+                break
+            rows = fetch_stock_page(conn, after=rows[-1][0], name_prefix=name_prefix, below=below)
+    finally:
+        conn.close()
 
 def get_or_create_supplier(conn, supplier_name):
     cursor = conn.cursor()
-    cursor.execute("SELECT supplier_id FROM suppliers WHERE name = %s", (supplier_name,))
-    result = cursor.fetchone()
+    supplier_id = inventory_cache.supplier_id(cursor, supplier_name)
 
-    if result:
-        print(f"ℹ Supplier '{supplier_name}' already exists (ID: {result[0]}).")
-        return result[0]
+    if supplier_id:
+        print(f"ℹ Supplier '{supplier_name}' already exists (ID: {supplier_id}).")
+        return supplier_id
     else:
         cursor.execute("INSERT INTO suppliers (name) VALUES (%s)", (supplier_name,))
         conn.commit()
         new_id = cursor.lastrowid
+        inventory_cache.remember_supplier(supplier_name, new_id)
         print(f"New supplier '{supplier_name}' added with ID: {new_id}.")
         return new_id
 
@@ -73,25 +243,30 @@ def add_medicine():
 
     supplier_id = get_or_create_supplier(conn, supplier_name)
 
-    cursor.execute("""
-        SELECT med_id, quantity FROM medicines 
-        WHERE name = %s AND category = %s AND price = %s 
-        AND expiry_date = %s AND manufacturer = %s
-    """, (name, category, price, expiry, manufacturer))
-    existing = cursor.fetchone()
-
-    if existing:
-        med_id, current_qty = existing
-        print(f"Medicine batch exists. Updating quantity.")
+    med_id = inventory_cache.find_batch(cursor, name, category, price, expiry, manufacturer)
+    if med_id is not None:
         cursor.execute("UPDATE medicines SET quantity = quantity + %s WHERE med_id = %s", (quantity, med_id))
+        if cursor.rowcount == 0 and quantity != 0:
+            # The cached batch was removed by another process.
+            inventory_cache.invalidate_medicine(name)
+            med_id = None
+
+    if med_id is not None:
+        print("Medicine batch exists. Updating quantity.")
+        cursor.execute("UPDATE medicines SET supplier_id = %s WHERE med_id = %s AND supplier_id IS NULL",
+                       (supplier_id, med_id))
+        stock_ledger.record(cursor, [(med_id, quantity)], stock_ledger.INTAKE)
         conn.commit()
+        inventory_cache.adjust_quantity(med_id, quantity)
     else:
         cursor.execute("""
-            INSERT INTO medicines (name, category, quantity, price, expiry_date, manufacturer, added_on)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (name, category, quantity, price, expiry, manufacturer, added_on))
-        conn.commit()
+            INSERT INTO medicines (name, category, quantity, price, expiry_date, manufacturer, added_on, supplier_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (name, category, quantity, price, expiry, manufacturer, added_on, supplier_id))
         med_id = cursor.lastrowid
+        stock_ledger.record(cursor, [(med_id, quantity)], stock_ledger.INTAKE)
+        conn.commit()
+        inventory_cache.add_batch(name, med_id, category, quantity, price, expiry, manufacturer)
         print("New medicine batch added.")
 
     cursor.execute("""
@@ -101,7 +276,7 @@ def add_medicine():
 
     if not link_exists:
         cursor.execute("""
-            INSERT INTO medicine_suppliers (med_id, supplier_id)
+            INSERT INTO medicine_supplier (med_id, supplier_id)
             VALUES (%s, %s)
         """, (med_id, supplier_id))
         conn.commit()
@@ -112,17 +287,49 @@ def add_medicine():
     cursor.close()
     conn.close()
 
+def restock(med_id, qty):
+    # Adds (or with a negative qty, removes) stock on one batch; returns rows updated.
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE medicines SET quantity = quantity + %s WHERE med_id = %s", (qty, med_id))
+        updated = cursor.rowcount
+        if updated:
+            stock_ledger.record(cursor, [(med_id, qty)], stock_ledger.ADJUST)
+        conn.commit()
+        inventory_cache.adjust_quantity(med_id, qty)
+        return updated
+    finally:
+        cursor.close()
+        conn.close()
+
 def update_quantity():
     med_id = int(input("Enter Medicine ID: "))
     qty = int(input("Enter Quantity to Add/Subtract (e.g. -5): "))
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE medicines SET quantity = quantity + %s WHERE med_id = %s", (qty, med_id))
-    conn.commit()
+    restock(med_id, qty)
     print("Quantity updated.")
-    cursor.close()
-    conn.close()
+
+def process_sale(med_name, qty, sale_date=None):
+    # Non-interactive sale path: one FEFO allocation in one transaction.
+    conn = get_connection()
+    try:
+        allocation = allocate_sale(conn, med_name, qty, sale_date)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    inventory_cache.apply_allocation(med_name, allocation)
+
+    # Keep the daily sales rollup current; the sale itself is already committed.
+    try:
+        rollup.catch_up(conn)
+    except Exception as e:
+        print(f"Warning: sales rollup not updated ({e}).")
+    finally:
+        conn.close()
+    return allocation
 
 def record_sale():
     try:
@@ -130,88 +337,388 @@ def record_sale():
         qty = int(input("Quantity Sold: "))
         sale_date_input = input("Sale Date (YYYY-MM-DD, leave blank for today): ").strip()
         sale_date = sale_date_input if sale_date_input else datetime.today().strftime('%Y-%m-%d')
+        if not _valid_date(sale_date):
+            print("Invalid sale date. Use YYYY-MM-DD.")
+            return
 
-        conn = get_connection()
-        cursor = conn.cursor(buffered=True)
+        allocation = process_sale(med_name, qty, sale_date)
 
-        cursor.execute("""
-            SELECT med_id, quantity, expiry_date 
-            FROM medicines 
-            WHERE name = %s AND quantity > 0
-            ORDER BY expiry_date ASC
-        """, (med_name,))
-        batches = cursor.fetchall()
-
-        if not batches:
+        sold = sum(q for _, q, _ in allocation)
+        if sold == 0:
             print(f"No stock found for '{med_name}'.")
+        elif sold < qty:
+            print(f"Only partial stock available. Sold {sold} units out of {qty}.")
         else:
-            qty_needed = qty
-            for med_id, available_qty, expiry_date in batches:
-                if expiry_date < datetime.today().date():
-                    continue
+            print(f"Sale recorded: {qty} units of '{med_name}' sold on {sale_date}.")
+
+    except ValueError:
+        print("Invalid input. Please enter numeric values for quantity.")
 
-                to_deduct = min(qty_needed, available_qty)
+def _sales_filters(name_prefix=None, date_from=None, date_to=None):
+    clauses, params = [], []
+    if name_prefix:
+        clauses.append("m.name LIKE %s")
+        params.append(_like_prefix(name_prefix))
+    if date_from:
+        clauses.append("s.sale_date >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append("s.sale_date <= %s")
+        params.append(date_to)
+    return clauses, params
+
+def _before_sale(clauses, params, before):
+    if before:
+        sale_date, sale_id = before
+        clauses.append("(s.sale_date < %s OR (s.sale_date = %s AND s.sale_id < %s))")
+        params.extend((sale_date, sale_date, sale_id))
+
+def fetch_sales_page(conn, before=None, limit=PAGE_SIZE, name_prefix=None, date_from=None, date_to=None):
+    # Keyset pagination, newest first, on (sale_date, sale_id); before is the last row's key.
+    clauses, params = _sales_filters(name_prefix, date_from, date_to)
+    _before_sale(clauses, params, before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
 
-                cursor.execute("""
-                    INSERT INTO sales (med_id, quantity_sold, sale_date)
-                    VALUES (%s, %s, %s)
-                """, (med_id, to_deduct, sale_date))
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT s.sale_id, m.name, s.quantity_sold, s.sale_date
+        FROM sales s
+        JOIN medicines m ON s.med_id = m.med_id
+        {where}
+        ORDER BY s.sale_date DESC, s.sale_id DESC
+        LIMIT %s
+    """, params + [limit])
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
 
-                cursor.execute("""
-                    UPDATE medicines SET quantity = quantity - %s WHERE med_id = %s
-                """, (to_deduct, med_id))
+def iter_sales(conn, name_prefix=None, date_from=None, date_to=None, before=None):
+    clauses, params = _sales_filters(name_prefix, date_from, date_to)
+    _before_sale(clauses, params, before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(f"""
+            SELECT s.sale_id, m.name, s.quantity_sold, s.sale_date
+            FROM sales s
+            JOIN medicines m ON s.med_id = m.med_id
+            {where}
+            ORDER BY s.sale_date DESC, s.sale_id DESC
+        """, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
 
-                qty_needed -= to_deduct
+def _print_sale_row(row):
+    print(f"Sale ID: {row[0]} | Medicine: {row[1]} | Qty Sold: {row[2]} | Date: {row[3]}")
 
-                if qty_needed == 0:
-                    break
+def view_sales():
+    name_prefix = input("Medicine name starts with (blank for all): ").strip() or None
+    date_from = input("From date YYYY-MM-DD (blank for any): ").strip() or None
+    date_to = input("To date YYYY-MM-DD (blank for any): ").strip() or None
 
-            if qty_needed > 0:
-                print(f"Only partial stock available. Sold {qty - qty_needed} units out of {qty}.")
-            else:
-                print(f"Sale recorded: {qty} units of '{med_name}' sold on {sale_date}.")
+    conn = get_connection()
+    try:
+        rows = fetch_sales_page(conn, name_prefix=name_prefix, date_from=date_from, date_to=date_to)
+        print("\n--- Sales Report ---")
+        while rows:
+            for row in rows:
+                _print_sale_row(row)
+            if len(rows) < PAGE_SIZE:
+                break
+
+            action = _prompt_page_action()
+            before = (rows[-1][3], rows[-1][0])
+            if action == "q":
+                break
+            if action == "a":
+                for row in iter_sales(conn, name_prefix, date_from, date_to, before=before):
+                    _print_sale_row(row)
+                break
+            rows = fetch_sales_page(conn, before=before, name_prefix=name_prefix,
+                                    date_from=date_from, date_to=date_to)
+    finally:
+        conn.close()
 
-            conn.commit()
+def main_menu():
+    while True:
+        show_menu()
+        choice = input("Enter your choice (1-7): ")
+
+        if choice == '1':
+            view_medicines()
+        elif choice == '2':
+            add_medicine()
+        elif choice == '3':
+            update_quantity()
+        elif choice == '4':
+            record_sale()
+        elif choice == '5':
+            view_sales()
+        elif choice == '6':
+            view_stock()
+        elif choice == '7':
+            print("Exiting program. Goodbye!")
+            break
+        else:
+            print("Invalid choice. Try again.")
+
+# === Non-interactive CLI ===
+# python main.py                       interactive menu
+# python main.py sell Paracetamol 10   one sale
+# python main.py sell --file sales.csv batch of "name,qty[,date]" lines ("-" for stdin)
+# python main.py restock 12 50
+# python main.py list --status "NEAR EXPIRY" --json
+# python main.py stock --below 20             medicines low on sellable stock
+# python main.py sales --from 2025-07-01 --to 2025-07-31 --all
+
+def _cache_committed(results):
+    for result in results:
+        if result.get("allocation"):
+            inventory_cache.apply_allocation(
+                result["medicine"], [(a["med_id"], a["quantity"]) for a in result["allocation"]])
+
+def _sale_result(line_no, name, qty, sale_date, allocation):
+    return {
+        "line": line_no,
+        "medicine": name,
+        "requested": qty,
+        "sold": sum(q for _, q, _ in allocation),
+        "sale_date": sale_date,
+        "allocation": [{"med_id": m, "quantity": q} for m, q, _ in allocation],
+    }
+
+def _sell_each(conn, pending):
+    # After a failed batch: every sale again in its own transaction, so only
+    # the sales that fail on their own are reported as errors.
+    for result in pending:
+        if "error" not in result:
+            try:
+                allocation = allocate_sale(conn, result["medicine"], result["requested"], result["sale_date"])
+                conn.commit()
+                result = _sale_result(result["line"], result["medicine"], result["requested"],
+                                      result["sale_date"], allocation)
+                _cache_committed([result])
+            except Exception as e:
+                conn.rollback()
+                result.update(sold=0, allocation=[], error=str(e))
+        yield result
+
+def sell_batch(rows, batch_size=100):
+    # rows: iterable of (line_no, name, qty, sale_date, error); a line with an error is rejected
+    # without selling. One connection for the whole run, one transaction per batch_size sales;
+    # if a batch fails its sales are retried one by one. Yields a result dict per row.
+    conn = get_connection()
+    pending = []
+    try:
+        for line_no, name, qty, sale_date, error in rows:
+            if error:
+                pending.append({"line": line_no, "medicine": name, "requested": qty, "sold": 0, "error": error})
+                continue
+            try:
+                allocation = allocate_sale(conn, name, qty, sale_date)
+            except Exception:
+                conn.rollback()
+                pending.append({"line": line_no, "medicine": name, "requested": qty, "sale_date": sale_date})
+                yield from _sell_each(conn, pending)
+                pending = []
+                continue
+
+            pending.append(_sale_result(line_no, name, qty, sale_date, allocation))
+            if len(pending) >= batch_size:
+                conn.commit()
+                _cache_committed(pending)
+                yield from pending
+                pending = []
 
-        cursor.close()
+        conn.commit()
+        _cache_committed(pending)
+        yield from pending
+        rollup.catch_up(conn)
+    finally:
         conn.close()
 
-    except ValueError:
-        print("Invalid input. Please enter numeric values for quantity.")
+def _valid_date(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def _read_sale_lines(stream, default_date):
+    # Yields (line_no, name, qty, sale_date, error); error is None for a valid line.
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [p.strip() for p in line.split(",")]
+        name = parts[0]
+        sale_date = parts[2] if len(parts) > 2 and parts[2] else default_date
+        try:
+            qty = int(parts[1]) if len(parts) > 1 else None
+        except ValueError:
+            qty = None
+        if qty is None or qty <= 0:
+            yield line_no, name, qty, sale_date, "quantity must be a positive integer"
+        elif not _valid_date(sale_date):
+            yield line_no, name, qty, sale_date, f"bad sale date {sale_date!r}, expected YYYY-MM-DD"
+        else:
+            yield line_no, name, qty, sale_date, None
 
-def view_sales():
+def _emit(data, as_json, print_text):
+    # One JSON object per line for machines, or the human-readable form.
+    if as_json:
+        import json
+        print(json.dumps(data, default=str))
+    else:
+        print_text()
+
+def _cmd_sell(args):
+    sale_date = args.date or datetime.today().strftime('%Y-%m-%d')
+    if not _valid_date(sale_date):
+        raise SystemExit(f"Bad sale date {sale_date!r}, expected YYYY-MM-DD.")
+    if args.file:
+        import sys
+        stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        try:
+            ok = failed = empty = 0
+            for result in sell_batch(_read_sale_lines(stream, sale_date), args.batch_size):
+                if "error" in result:
+                    failed += 1
+                elif result["sold"] == 0:
+                    empty += 1
+                else:
+                    ok += 1
+                if "error" in result:
+                    text = f"line {result['line']}: {result['medicine']} ERROR {result['error']}"
+                else:
+                    text = f"line {result['line']}: {result['medicine']} sold {result['sold']}/{result['requested']}"
+                _emit(result, args.json, lambda: print(text))
+            if not args.json:
+                print(f"{ok} sales recorded, {empty} out of stock, {failed} failed.")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return
+
+    if not args.name or args.qty is None:
+        raise SystemExit("sell needs NAME QTY or --file")
+    if args.qty <= 0:
+        raise SystemExit("Quantity must be positive.")
+    allocation = process_sale(args.name, args.qty, sale_date)
+    sold = sum(q for _, q, _ in allocation)
+    _emit({"medicine": args.name, "requested": args.qty, "sold": sold, "sale_date": sale_date,
+           "allocation": [{"med_id": m, "quantity": q} for m, q, _ in allocation]},
+          args.json, lambda: print(f"Sold {sold} of {args.qty} units of '{args.name}' on {sale_date}."))
+
+def _cmd_restock(args):
+    updated = restock(args.med_id, args.qty)
+    if not updated:
+        raise SystemExit(f"No medicine batch with ID {args.med_id}.")
+    _emit({"med_id": args.med_id, "added": args.qty}, args.json,
+          lambda: print(f"Quantity of batch {args.med_id} changed by {args.qty}."))
+
+def _cmd_list(args):
+    status = args.status.upper() if args.status else None
+    if status and status not in STATUSES:
+        raise SystemExit(f"Invalid status. Choose one of: {', '.join(STATUSES)}.")
+    keys = ["med_id", "name", "category", "manufacturer", "quantity", "price", "expiry_date", "added_on", "status"]
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT s.sale_id, m.name, s.quantity_sold, s.sale_date
-        FROM sales s
-        JOIN medicines m ON s.med_id = m.med_id
-        ORDER BY s.sale_date DESC
-    """)
-    rows = cursor.fetchall()
-    print("\n--- Sales Report ---")
-    for row in rows:
-        print(f"Sale ID: {row[0]} | Medicine: {row[1]} | Qty Sold: {row[2]} | Date: {row[3]}")
-    cursor.close()
-    conn.close()
+    try:
+        if args.all:
+            rows = iter_medicines(conn, args.name_prefix, args.category, status)
+        else:
+            rows = fetch_medicines_page(conn, limit=args.limit, name_prefix=args.name_prefix,
+                                        category=args.category, status=status)
+        if not args.json:
+            _print_medicine_header()
+        for row in rows:
+            _emit(dict(zip(keys, row)), args.json, lambda: _print_medicine_row(row))
+    finally:
+        conn.close()
+
+def _cmd_stock(args):
+    keys = ["name", "sellable_qty", "total_qty", "batches", "earliest_expiry"]
+    conn = get_connection()
+    try:
+        if args.all:
+            rows = iter_stock(conn, args.name_prefix, args.below)
+        else:
+            rows = fetch_stock_page(conn, limit=args.limit, name_prefix=args.name_prefix, below=args.below)
+        if not args.json:
+            _print_stock_header()
+        for row in rows:
+            _emit(dict(zip(keys, row)), args.json, lambda: _print_stock_row(row))
+    finally:
+        conn.close()
 
-# Main CLI loop
-while True:
-    show_menu()
-    choice = input("Enter your choice (1-6): ")
-
-    if choice == '1':
-        view_medicines()
-    elif choice == '2':
-        add_medicine()
-    elif choice == '3':
-        update_quantity()
-    elif choice == '4':
-        record_sale()
-    elif choice == '5':
-        view_sales()
-    elif choice == '6':
-        print("Exiting program. Goodbye!")
-        break
+def _cmd_sales(args):
+    keys = ["sale_id", "medicine", "quantity_sold", "sale_date"]
+    conn = get_connection()
+    try:
+        if args.all:
+            rows = iter_sales(conn, args.name_prefix, args.date_from, args.date_to)
+        else:
+            rows = fetch_sales_page(conn, limit=args.limit, name_prefix=args.name_prefix,
+                                    date_from=args.date_from, date_to=args.date_to)
+        for row in rows:
+            _emit(dict(zip(keys, row)), args.json, lambda: _print_sale_row(row))
+    finally:
+        conn.close()
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Medicine inventory & sales management.")
+    sub = parser.add_subparsers(dest="command")
+    # Every subcommand prints rows or a result, so each takes --json after its name.
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", help="JSON lines output")
+
+    sell = sub.add_parser("sell", help="record one sale or a batch of sales", parents=[output])
+    sell.add_argument("name", nargs="?")
+    sell.add_argument("qty", nargs="?", type=int)
+    sell.add_argument("--date", help="sale date YYYY-MM-DD (default today)")
+    sell.add_argument("--file", help='CSV of "name,qty[,date]" lines, "-" for stdin')
+    sell.add_argument("--batch-size", type=int, default=100, help="sales per transaction in --file mode")
+    sell.set_defaults(handler=_cmd_sell)
+
+    restock_cmd = sub.add_parser("restock", help="change the quantity of a batch", parents=[output])
+    restock_cmd.add_argument("med_id", type=int)
+    restock_cmd.add_argument("qty", type=int)
+    restock_cmd.set_defaults(handler=_cmd_restock)
+
+    list_cmd = sub.add_parser("list", help="list medicine batches", parents=[output])
+    list_cmd.add_argument("--name-prefix")
+    list_cmd.add_argument("--category")
+    list_cmd.add_argument("--status", help=" / ".join(STATUSES))
+    list_cmd.add_argument("--limit", type=int, default=PAGE_SIZE)
+    list_cmd.add_argument("--all", action="store_true", help="stream every matching row")
+    list_cmd.set_defaults(handler=_cmd_list)
+
+    stock_cmd = sub.add_parser("stock", help="list stock per medicine (all batches of a name)", parents=[output])
+    stock_cmd.add_argument("--name-prefix")
+    stock_cmd.add_argument("--below", type=int, help="only medicines with less sellable stock (low-stock alert)")
+    stock_cmd.add_argument("--limit", type=int, default=PAGE_SIZE)
+    stock_cmd.add_argument("--all", action="store_true", help="stream every matching row")
+    stock_cmd.set_defaults(handler=_cmd_stock)
+
+    sales_cmd = sub.add_parser("sales", help="list sales, newest first", parents=[output])
+    sales_cmd.add_argument("--name-prefix")
+    sales_cmd.add_argument("--from", dest="date_from")
+    sales_cmd.add_argument("--to", dest="date_to")
+    sales_cmd.add_argument("--limit", type=int, default=PAGE_SIZE)
+    sales_cmd.add_argument("--all", action="store_true", help="stream every matching row")
+    sales_cmd.set_defaults(handler=_cmd_sales)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        main_menu()
     else:
-        print("Invalid choice. Try again.")
+        args.handler(args)
+
+if __name__ == "__main__":
+    main()
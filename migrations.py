@@ -0,0 +1,478 @@
+# migrations.py
+# Versioned, ordered schema migrations. Each migration checks the live schema
+# before changing it, so re-running one that was half applied is safe
+# (MySQL DDL commits implicitly and cannot be rolled back).
+#
+# SQLite databases start from sqlite_backend.SCHEMA, which already matches
+# migration SCHEMA_VERSION; see stamp(). Migrations after that one must run on
+# both backends (the helpers below inspect the schema on either).
+
+from datetime import date, datetime
+
+from db_config import BACKEND, get_connection
+
+
+# === Schema inspection helpers ===
+def _column_exists(cursor, table, column):
+    if BACKEND == "sqlite":
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def _index_exists(cursor, table, index):
+    if BACKEND == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table})")
+        return any(row[1] == index for row in cursor.fetchall())
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def _add_index(cursor, table, index, columns):
+    if not _index_exists(cursor, table, index):
+        cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+
+
+# === Migrations ===
+def m001_medicines_added_on(cursor):
+    # main.add_medicine and the reports rely on added_on; the original schema lacked it.
+    if not _column_exists(cursor, "medicines", "added_on"):
+        cursor.execute("""
+            ALTER TABLE medicines
+            ADD COLUMN added_on DATETIME DEFAULT CURRENT_TIMESTAMP
+        """)
+
+
+def m002_medicines_lookup_indexes(cursor):
+    # (name, expiry_date, ...) serves the FEFO sale lookup by its prefix and the
+    # five-column duplicate-batch check in add_medicine in full.
+    _add_index(cursor, "medicines", "idx_medicines_name_expiry_batch",
+               "name, expiry_date, manufacturer, category, price")
+    _add_index(cursor, "medicines", "idx_medicines_expiry", "expiry_date")
+
+
+def m003_sales_date_index(cursor):
+    _add_index(cursor, "sales", "idx_sales_date_med", "sale_date, med_id")
+
+
+def m004_medicine_supplier_pk(cursor):
+    if _index_exists(cursor, "medicine_supplier", "PRIMARY"):
+        return
+    # Existing rows may contain duplicate links; rebuild the table de-duplicated.
+    cursor.execute("DROP TABLE IF EXISTS medicine_supplier_new")
+    cursor.execute("""
+        CREATE TABLE medicine_supplier_new (
+            med_id INT NOT NULL,
+            supplier_id INT NOT NULL,
+            PRIMARY KEY (med_id, supplier_id),
+            INDEX idx_medicine_supplier_supplier (supplier_id),
+            FOREIGN KEY (med_id) REFERENCES medicines(med_id),
+            FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
+        )
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO medicine_supplier_new (med_id, supplier_id)
+        SELECT med_id, supplier_id FROM medicine_supplier
+        WHERE med_id IS NOT NULL AND supplier_id IS NOT NULL
+    """)
+    cursor.execute("""
+        RENAME TABLE medicine_supplier TO medicine_supplier_old,
+                     medicine_supplier_new TO medicine_supplier
+    """)
+    cursor.execute("DROP TABLE medicine_supplier_old")
+
+
+def m005_medicines_unique_batch(cursor):
+    # Bulk import upserts on the batch identity, which needs a UNIQUE key.
+    # Fold existing duplicate batches into the lowest med_id first.
+    if _index_exists(cursor, "medicines", "uq_medicines_batch"):
+        return
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS batch_dupes")
+    cursor.execute("""
+        CREATE TEMPORARY TABLE batch_dupes AS
+        SELECT m.med_id, k.keep_id
+        FROM medicines m
+        JOIN (
+            SELECT MIN(med_id) AS keep_id, name, expiry_date, manufacturer, category, price
+            FROM medicines
+            GROUP BY name, expiry_date, manufacturer, category, price
+            HAVING COUNT(*) > 1
+        ) k ON m.name <=> k.name AND m.expiry_date <=> k.expiry_date
+           AND m.manufacturer <=> k.manufacturer AND m.category <=> k.category
+           AND m.price <=> k.price
+        WHERE m.med_id <> k.keep_id
+    """)
+    cursor.execute("""
+        UPDATE medicines kept
+        JOIN (
+            SELECT d.keep_id, SUM(m.quantity) AS qty
+            FROM batch_dupes d JOIN medicines m ON m.med_id = d.med_id
+            GROUP BY d.keep_id
+        ) x ON kept.med_id = x.keep_id
+        SET kept.quantity = kept.quantity + x.qty
+    """)
+    cursor.execute("""
+        UPDATE sales s JOIN batch_dupes d ON s.med_id = d.med_id
+        SET s.med_id = d.keep_id
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO medicine_supplier (med_id, supplier_id)
+        SELECT d.keep_id, ms.supplier_id
+        FROM medicine_supplier ms JOIN batch_dupes d ON ms.med_id = d.med_id
+    """)
+    cursor.execute("""
+        DELETE ms FROM medicine_supplier ms JOIN batch_dupes d ON ms.med_id = d.med_id
+    """)
+    cursor.execute("""
+        DELETE m FROM medicines m JOIN batch_dupes d ON m.med_id = d.med_id
+    """)
+    cursor.execute("DROP TEMPORARY TABLE batch_dupes")
+
+    cursor.execute("""
+        CREATE UNIQUE INDEX uq_medicines_batch
+        ON medicines (name, expiry_date, manufacturer, category, price)
+    """)
+    # The unique key has the same column order, so the plain index is redundant.
+    if _index_exists(cursor, "medicines", "idx_medicines_name_expiry_batch"):
+        cursor.execute("DROP INDEX idx_medicines_name_expiry_batch ON medicines")
+
+
+def m006_suppliers_name_index(cursor):
+    _add_index(cursor, "suppliers", "idx_suppliers_name", "name")
+
+
+def m007_daily_sales_summary(cursor):
+    # Rollup of sales per (day, batch); see rollup.py for how it is maintained.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales_summary (
+            sale_date DATE NOT NULL,
+            med_id INT NOT NULL,
+            qty INT NOT NULL,
+            PRIMARY KEY (sale_date, med_id),
+            INDEX idx_daily_sales_summary_med (med_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name VARCHAR(50) PRIMARY KEY,
+            watermark INT NOT NULL DEFAULT 0,
+            pending_high INT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO rollup_state (name, watermark, pending_high)
+        SELECT 'daily_sales', 0, COALESCE(MAX(sale_id), 0) FROM sales
+    """)
+
+
+def m008_sales_archive(cursor):
+    # Totals of sales moved out by sales_archive.py, so the rollup can still be
+    # verified and rebuilt after their rows are gone; plus a log of the files.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales_archived (
+            sale_date DATE NOT NULL,
+            med_id INT NOT NULL,
+            qty INT NOT NULL,
+            PRIMARY KEY (sale_date, med_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_archive_log (
+            period_start DATE NOT NULL,
+            first_sale_id INT NOT NULL,
+            last_sale_id INT NOT NULL,
+            sales INT NOT NULL,
+            units INT NOT NULL,
+            path VARCHAR(500) NOT NULL,
+            archived_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (period_start, first_sale_id)
+        )
+    """)
+
+
+def m009_medicines_supplier(cursor):
+    # The supplier a batch is attributed to (the one that delivered it at
+    # intake). Reports group on this instead of joining medicine_supplier,
+    # which fans out when a batch has several suppliers. Existing batches take
+    # their lowest linked supplier.
+    if not _column_exists(cursor, "medicines", "supplier_id"):
+        if BACKEND == "sqlite":
+            cursor.execute("ALTER TABLE medicines ADD COLUMN supplier_id INT REFERENCES suppliers(supplier_id)")
+        else:
+            cursor.execute("""
+                ALTER TABLE medicines
+                ADD COLUMN supplier_id INT NULL,
+                ADD CONSTRAINT fk_medicines_supplier FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
+            """)
+    _add_index(cursor, "medicines", "idx_medicines_supplier", "supplier_id")
+    cursor.execute("""
+        UPDATE medicines
+        SET supplier_id = (
+            SELECT MIN(ms.supplier_id) FROM medicine_supplier ms WHERE ms.med_id = medicines.med_id
+        )
+        WHERE supplier_id IS NULL
+    """)
+
+
+# Trigger bodies for m010. A batch counts towards sellable_qty / earliest_expiry
+# while it has stock and expiry_date >= the row's as_of (see stock_summary.py).
+_STOCK_ADD = """
+    {ensure_row};
+    UPDATE medicine_stock
+    SET total_qty = total_qty + NEW.quantity,
+        batches = batches + 1,
+        sellable_qty = sellable_qty
+            + CASE WHEN NEW.quantity > 0 AND NEW.expiry_date >= as_of THEN NEW.quantity ELSE 0 END,
+        earliest_expiry = CASE
+            WHEN NEW.quantity > 0 AND NEW.expiry_date >= as_of
+                 AND (earliest_expiry IS NULL OR NEW.expiry_date < earliest_expiry)
+            THEN NEW.expiry_date ELSE earliest_expiry END
+    WHERE name = NEW.name;
+"""
+
+# Runs after the batch row changed, so the recount of earliest_expiry sees the
+# new state of the table.
+_STOCK_REMOVE = """
+    UPDATE medicine_stock
+    SET total_qty = total_qty - OLD.quantity,
+        batches = batches - 1,
+        sellable_qty = sellable_qty
+            - CASE WHEN OLD.quantity > 0 AND OLD.expiry_date >= as_of THEN OLD.quantity ELSE 0 END,
+        earliest_expiry = CASE
+            WHEN OLD.quantity > 0 AND OLD.expiry_date = earliest_expiry
+            THEN (SELECT MIN(m.expiry_date) FROM medicines m
+                  WHERE m.name = OLD.name AND m.quantity > 0 AND m.expiry_date >= medicine_stock.as_of)
+            ELSE earliest_expiry END
+    WHERE name = OLD.name;
+"""
+
+
+def m010_medicine_stock(cursor):
+    # Per-name stock summary kept in step with medicines by triggers, filled
+    # from the existing batches.
+    if BACKEND == "sqlite":
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS medicine_stock (
+                name VARCHAR(100) COLLATE NOCASE PRIMARY KEY,
+                total_qty INT NOT NULL DEFAULT 0,
+                batches INT NOT NULL DEFAULT 0,
+                sellable_qty INT NOT NULL DEFAULT 0,
+                earliest_expiry DATE,
+                as_of DATE NOT NULL
+            )
+        """)
+        # Not INSERT OR IGNORE: an outer upsert (bulk_import) overrides the
+        # conflict policy of statements inside the trigger.
+        ensure_row = """
+            INSERT INTO medicine_stock (name, as_of)
+            SELECT NEW.name, date('now', 'localtime')
+            WHERE NOT EXISTS (SELECT 1 FROM medicine_stock WHERE name = NEW.name)
+        """
+        update_of = "UPDATE OF name, quantity, expiry_date"
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS medicine_stock (
+                name VARCHAR(100) PRIMARY KEY,
+                total_qty INT NOT NULL DEFAULT 0,
+                batches INT NOT NULL DEFAULT 0,
+                sellable_qty INT NOT NULL DEFAULT 0,
+                earliest_expiry DATE NULL,
+                as_of DATE NOT NULL
+            )
+        """)
+        ensure_row = "INSERT IGNORE INTO medicine_stock (name, as_of) VALUES (NEW.name, CURDATE())"
+        update_of = "UPDATE"
+    _add_index(cursor, "medicine_stock", "idx_medicine_stock_earliest_expiry", "earliest_expiry")
+
+    add, remove = _STOCK_ADD.format(ensure_row=ensure_row.strip()), _STOCK_REMOVE
+    for trigger, event, body in [
+        ("trg_medicines_stock_insert", "INSERT", add),
+        ("trg_medicines_stock_update", update_of, remove + add),
+        ("trg_medicines_stock_delete", "DELETE", remove),
+    ]:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"CREATE TRIGGER {trigger} AFTER {event} ON medicines FOR EACH ROW BEGIN {body} END")
+
+    today = date.today()
+    cursor.execute("DELETE FROM medicine_stock")
+    cursor.execute("""
+        INSERT INTO medicine_stock (name, total_qty, batches, sellable_qty, earliest_expiry, as_of)
+        SELECT name, SUM(quantity), COUNT(*),
+               SUM(CASE WHEN quantity > 0 AND expiry_date >= %s THEN quantity ELSE 0 END),
+               MIN(CASE WHEN quantity > 0 AND expiry_date >= %s THEN expiry_date END),
+               %s
+        FROM medicines
+        GROUP BY name
+    """, (today, today, today))
+
+
+def m011_stock_ledger(cursor):
+    # Append-only stock movements with periodic per-batch snapshots; see
+    # stock_ledger.py. The ledger opens with each batch's current quantity, so
+    # stock on dates before this migration is not known.
+    if BACKEND == "sqlite":
+        movement_id = "movement_id INTEGER PRIMARY KEY AUTOINCREMENT"
+    else:
+        movement_id = "movement_id BIGINT AUTO_INCREMENT PRIMARY KEY"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            {movement_id},
+            med_id INT NOT NULL,
+            delta INT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            moved_at DATETIME NOT NULL
+        )
+    """)
+    _add_index(cursor, "stock_movements", "idx_stock_movements_moved_at", "moved_at, med_id, delta")
+    _add_index(cursor, "stock_movements", "idx_stock_movements_med", "med_id")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            snapshot_date DATE NOT NULL,
+            med_id INT NOT NULL,
+            quantity INT NOT NULL,
+            PRIMARY KEY (snapshot_date, med_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_snapshot_log (
+            snapshot_date DATE PRIMARY KEY,
+            batches INT NOT NULL,
+            units INT NOT NULL,
+            taken_on DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM stock_movements")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("""
+            INSERT INTO stock_movements (med_id, delta, kind, moved_at)
+            SELECT med_id, quantity, 'opening', %s FROM medicines WHERE quantity <> 0
+        """, (datetime.now(),))
+
+
+def m012_expiry_alerts(cursor):
+    # Alerts raised by expiry_alerts.py, one per batch and status, and the
+    # watermark of the last run.
+    if BACKEND == "sqlite":
+        alert_id = "alert_id INTEGER PRIMARY KEY AUTOINCREMENT"
+    else:
+        alert_id = "alert_id INT AUTO_INCREMENT PRIMARY KEY"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS expiry_alerts (
+            {alert_id},
+            med_id INT NOT NULL,
+            status VARCHAR(12) NOT NULL,
+            expiry_date DATE NOT NULL,
+            quantity INT NOT NULL,
+            quarantined_qty INT NOT NULL DEFAULT 0,
+            alerted_on DATETIME NOT NULL
+        )
+    """)
+    if not _index_exists(cursor, "expiry_alerts", "uq_expiry_alerts_batch_status"):
+        cursor.execute("CREATE UNIQUE INDEX uq_expiry_alerts_batch_status ON expiry_alerts (med_id, status)")
+    _add_index(cursor, "expiry_alerts", "idx_expiry_alerts_alerted_on", "alerted_on")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS expiry_alert_state (
+            name VARCHAR(50) PRIMARY KEY,
+            checked_through DATE NULL,
+            last_med_id INT NOT NULL DEFAULT 0,
+            pending_med_id INT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT IGNORE INTO expiry_alert_state (name) VALUES ('expiry')")
+
+
+def m013_sales_date_id_index(cursor):
+    # dashboard_queries.sales_page orders by (sale_date, sale_id); with
+    # idx_sales_date_med the med_id column sits in between and forces a sort.
+    _add_index(cursor, "sales", "idx_sales_date_id", "sale_date, sale_id")
+
+
+MIGRATIONS = [
+    (1, "medicines.added_on column", m001_medicines_added_on),
+    (2, "medicines lookup indexes", m002_medicines_lookup_indexes),
+    (3, "sales (sale_date, med_id) index", m003_sales_date_index),
+    (4, "medicine_supplier composite primary key", m004_medicine_supplier_pk),
+    (5, "medicines unique batch key", m005_medicines_unique_batch),
+    (6, "suppliers name index", m006_suppliers_name_index),
+    (7, "daily_sales_summary rollup", m007_daily_sales_summary),
+    (8, "sales archive tables", m008_sales_archive),
+    (9, "medicines.supplier_id attribution", m009_medicines_supplier),
+    (10, "medicine_stock summary and triggers", m010_medicine_stock),
+    (11, "stock movement ledger and snapshots", m011_stock_ledger),
+    (12, "expiry alerts and watermark", m012_expiry_alerts),
+    (13, "sales (sale_date, sale_id) index", m013_sales_date_id_index),
+]
+
+
+# === Runner ===
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(200),
+            applied_on DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def stamp(conn, up_to):
+    # Records migrations <= up_to as applied without running them, for a
+    # schema that was created directly at that version.
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+        for version, description, _ in MIGRATIONS:
+            if version <= up_to and version not in done:
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description),
+                )
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def run_migrations(conn=None):
+    own_conn = conn is None
+    conn = conn or get_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        done = applied_versions(cursor)
+        for version, description, migrate in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in done:
+                continue
+            migrate(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            conn.commit()
+            applied.append(version)
+            print(f"Applied migration {version:03d}: {description}")
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+    if not applied:
+        print("Schema is up to date.")
+    return applied
+
+
+if __name__ == "__main__":
+    run_migrations()
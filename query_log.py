@@ -0,0 +1,290 @@
+# query_log.py
+# Statement instrumentation for pooled connections. When enabled (see
+# [query_log] in db_config), every cursor handed out by db_config records per
+# statement the execute + fetch time and the rows returned or affected, and
+# the pool records how long each connection checkout took. Statements slower
+# than slow_ms are written to the slow-query log, optionally with their EXPLAIN
+# plan. Timings are aggregated per fingerprint (the SQL with literals and
+# placeholder lists collapsed) and can be dumped on exit.
+#
+#   MEDINV_QUERY_LOG_ENABLED=1 MEDINV_QUERY_LOG_SLOW_MS=50 MEDINV_QUERY_LOG_EXPLAIN=1 \
+#   MEDINV_QUERY_LOG_STATS_FILE=query_stats.json python analytics.py all
+#   python query_log.py query_stats.json --top 10
+
+import atexit
+import json
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+
+# Set up by configure() only when enabled, so importing this module stays cheap.
+logger = None
+
+_config = {"enabled": False, "slow_ms": 200.0, "explain": False, "explain_prefix": "EXPLAIN",
+           "stats_file": ""}
+
+# Samples kept per fingerprint for the p95; older ones are overwritten in turn.
+MAX_SAMPLES = 1000
+
+
+def configure(enabled=False, slow_ms=200.0, explain=False, log_file="", stats_file="", backend="mysql"):
+    _config.update(enabled=enabled, slow_ms=slow_ms, explain=explain, stats_file=stats_file,
+                   explain_prefix="EXPLAIN QUERY PLAN" if backend == "sqlite" else "EXPLAIN")
+    if not enabled:
+        return
+    import logging
+
+    global logger
+    logger = logging.getLogger("medinv.queries")
+    if not logger.handlers:
+        handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if stats_file:
+        atexit.register(dump_stats, stats_file)
+
+
+def enabled():
+    return _config["enabled"]
+
+
+# === Fingerprints ===
+_FINGERPRINT_REWRITES = [
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),
+    (re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+"), "(?+), ..."),
+    (re.compile(r"(?:WHEN \? THEN \? ?){2,}", re.I), "WHEN ? THEN ? ... "),
+]
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    sql = sql.strip()
+    for pattern, replacement in _FINGERPRINT_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+# === Aggregated stats ===
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._acquire = {"count": 0, "total": 0.0, "max": 0.0, "samples": []}
+
+    @staticmethod
+    def _add_sample(entry, seconds):
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+        if len(entry["samples"]) < MAX_SAMPLES:
+            entry["samples"].append(seconds)
+        else:
+            entry["samples"][entry["count"] % MAX_SAMPLES] = seconds
+
+    def record(self, fp, seconds, rows, slow):
+        with self._lock:
+            entry = self._queries.get(fp)
+            if entry is None:
+                entry = self._queries[fp] = {"count": 0, "total": 0.0, "max": 0.0, "rows": 0,
+                                             "slow": 0, "samples": []}
+            self._add_sample(entry, seconds)
+            entry["rows"] += max(rows, 0)
+            entry["slow"] += slow
+
+    def record_acquire(self, seconds):
+        with self._lock:
+            self._add_sample(self._acquire, seconds)
+
+    @staticmethod
+    def _summary(entry):
+        samples = sorted(entry["samples"])
+        p95 = samples[max(1, int(round(0.95 * len(samples)))) - 1] if samples else 0.0
+        return {"count": entry["count"], "total_ms": round(entry["total"] * 1000, 3),
+                "mean_ms": round(entry["total"] / entry["count"] * 1000, 3) if entry["count"] else None,
+                "p95_ms": round(p95 * 1000, 3), "max_ms": round(entry["max"] * 1000, 3)}
+
+    def snapshot(self):
+        with self._lock:
+            queries = []
+            for fp, entry in self._queries.items():
+                queries.append({"fingerprint": fp, **self._summary(entry),
+                                "rows": entry["rows"], "slow": entry["slow"]})
+            acquire = self._summary(self._acquire)
+        queries.sort(key=lambda q: q["total_ms"], reverse=True)
+        return {"queries": queries, "connection_acquire": acquire}
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._acquire = {"count": 0, "total": 0.0, "max": 0.0, "samples": []}
+
+
+STATS = QueryStats()
+
+
+def record_acquire(seconds):
+    STATS.record_acquire(seconds)
+
+
+def stats():
+    return STATS.snapshot()
+
+
+def dump_stats(path):
+    # "-" prints the table to stderr instead of writing JSON.
+    snapshot = stats()
+    if path == "-":
+        print_stats(snapshot, out=sys.stderr)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2)
+
+
+def print_stats(snapshot, top=20, out=None):
+    out = out or sys.stdout
+    acquire = snapshot["connection_acquire"]
+    print(f"connection acquire: {acquire['count']} checkouts, p95 {acquire['p95_ms']} ms, "
+          f"max {acquire['max_ms']} ms", file=out)
+    print(f"{'count':>7} {'total ms':>10} {'p95 ms':>9} {'rows':>9} {'slow':>5}  statement", file=out)
+    for q in snapshot["queries"][:top]:
+        print(f"{q['count']:>7} {q['total_ms']:>10.1f} {q['p95_ms']:>9.2f} {q['rows']:>9} {q['slow']:>5}  "
+              f"{q['fingerprint'][:120]}", file=out)
+
+
+# === Instrumented cursor ===
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.I)
+
+
+def _explain(raw_conn, sql, params):
+    # Plan of a slow SELECT, as text lines; never raises.
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    cursor = None
+    try:
+        cursor = raw_conn.cursor()
+        cursor.execute(f"{_config['explain_prefix']} {_FOR_UPDATE.sub('', sql.strip())}", params)
+        return [" | ".join(str(v) for v in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+class InstrumentedCursor:
+    # Wraps a driver cursor. A statement is finished when its rows are
+    # exhausted, or on the next execute / close (whichever comes first).
+
+    def __init__(self, raw_conn, raw_cursor, on_close=None):
+        self._raw_conn = raw_conn
+        self._cursor = raw_cursor
+        self._pending = None  # [sql, params, seconds, rows]
+        self._on_close = on_close
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows = pending
+        slow = seconds * 1000 >= _config["slow_ms"]
+        STATS.record(fingerprint(sql), seconds, rows, slow)
+        if slow:
+            logger.info("slow query %.1f ms, %d rows: %s params=%.200r",
+                        seconds * 1000, rows, " ".join(sql.split())[:1000], tuple(params or ()))
+            if _config["explain"]:
+                plan = _explain(self._raw_conn, sql, params)
+                if plan:
+                    logger.info("  plan:\n    %s", "\n    ".join(plan))
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - start
+
+    def execute(self, sql, params=()):
+        self._finish()
+        self._pending = [sql, params, 0.0, 0]
+        result = self._timed(self._cursor.execute, sql, params)
+        if self._cursor.description is None:
+            self._pending[3] = self._cursor.rowcount
+            self._finish()
+        return result
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        seq_of_params = list(seq_of_params)
+        self._pending = [sql, seq_of_params[:1], 0.0, 0]
+        result = self._timed(self._cursor.executemany, sql, seq_of_params)
+        self._pending[3] = self._cursor.rowcount
+        self._finish()
+        return result
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._pending[3] += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(self._cursor.fetchmany, *args)
+        if self._pending is not None:
+            if rows:
+                self._pending[3] += len(rows)
+            else:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            self._finish()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._finish()
+        if self._on_close is not None:
+            self._on_close(self)
+        return self._cursor.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show aggregated query stats written via MEDINV_QUERY_LOG_STATS_FILE.")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    with open(args.path, encoding="utf-8") as f:
+        print_stats(json.load(f), args.top)
+
+
+if __name__ == "__main__":
+    main()
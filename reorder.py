@@ -0,0 +1,214 @@
+# reorder.py
+# Reorder points and stock-out forecasts for every medicine at once.
+#
+# Daily demand per medicine (all batches of one name) is the moving average of
+# its sales over the last --window days, read in one query from the
+# daily_sales_summary rollup. Stock that will expire before FEFO selling at that
+# rate reaches it is not counted as usable. All medicines are computed together
+# with pandas/NumPy column operations; there is no per-medicine query or loop.
+#
+#   python reorder.py reorder.csv --window 28 --lead-time 7 --review-days 14
+#   python reorder.py reorder.csv --service-level 0.98 --all
+#
+# reorder_point = demand * lead_time + safety stock
+# safety stock  = z(service_level) * daily_std * sqrt(lead_time)
+# order_up_to   = demand * (lead_time + review_days) + safety stock
+# A medicine whose usable stock is at or below its reorder point gets an order
+# for (order_up_to - usable stock).
+
+import argparse
+import time
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from db_config import get_connection
+from rollup import DAILY_SALES_SOURCE
+
+DEFAULT_WINDOW = 28
+DEFAULT_LEAD_TIME = 7
+DEFAULT_REVIEW_DAYS = 14
+DEFAULT_SERVICE_LEVEL = 0.95
+
+# Raw (sale_date, med_id, qty) rows: no join or GROUP BY in SQL, the rows are
+# attributed to medicine names and summed per day in pandas.
+HISTORY_QUERY = f"""
+    SELECT d.med_id, d.sale_date, d.qty
+    FROM {DAILY_SALES_SOURCE} d
+    WHERE d.sale_date > %s AND d.sale_date <= %s
+"""
+
+BATCHES_QUERY = """
+    SELECT med_id, name, quantity, expiry_date FROM medicines
+"""
+
+REORDER_COLUMNS = ["Medicine", "Stock", "Expiring_Unsold", "Usable_Stock", "Avg_Daily_Demand",
+                   "Demand_Std", "Days_Of_Cover", "Stockout_Date", "Reorder_Point", "Order_Up_To",
+                   "Reorder_Qty"]
+
+
+def _read_sql(query, params=None):
+    conn = get_connection()
+    try:
+        return pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def load_history(window, today):
+    return _read_sql(HISTORY_QUERY, [today - timedelta(days=window), today])
+
+
+def load_batches():
+    return _read_sql(BATCHES_QUERY)
+
+
+# === Demand ===
+def sku_index(batches):
+    # (codes, names): one code per batch row naming its medicine. Names compare
+    # case-insensitively in the database (NOCASE / _ci collations), so they do
+    # here too; the first spelling seen is the one reported.
+    codes, _ = pd.factorize(batches["name"].astype(str).str.casefold())
+    first = pd.Series(np.arange(len(codes))).groupby(codes).first().to_numpy()
+    return codes, batches["name"].to_numpy()[first]
+
+
+def demand_stats(history, batches, codes, window):
+    # Mean and standard deviation of daily units per medicine over the window,
+    # counting days without sales as zero. Sales are summed per (medicine, day)
+    # on an integer key, then reduced to sums of qty and qty^2 per medicine, so
+    # nothing is expanded to one row per medicine per day.
+    n = int(codes.max()) + 1 if len(codes) else 0
+    rows = pd.Index(batches["med_id"]).get_indexer(history["med_id"])
+    known = rows >= 0  # every sale's batch exists unless medicines were reset
+    sku = codes[rows[known]].astype("int64")
+    day = pd.to_datetime(history["sale_date"][known]).to_numpy().astype("datetime64[D]").astype("int64")
+    day -= day.min() if len(day) else 0
+    span = int(day.max()) + 1 if len(day) else 1
+    daily = pd.Series(history["qty"][known].to_numpy(dtype="float64")).groupby(sku * span + day).sum()
+    daily_sku = daily.index.to_numpy() // span
+    qty = daily.to_numpy()
+
+    total = np.bincount(daily_sku, weights=qty, minlength=n)
+    total_sq = np.bincount(daily_sku, weights=qty * qty, minlength=n)
+    mean = total / window
+    variance = np.clip(total_sq / window - mean ** 2, 0, None)
+    return mean, np.sqrt(variance * window / max(window - 1, 1))
+
+
+# === Usable stock ===
+def usable_stock(batches, codes, demand, today):
+    # Units of each medicine expected to sell before they expire.
+    #
+    # Selling FEFO at a steady rate D, batch i (sorted by expiry, t_i days left)
+    # can only have sold D * t_i units by its expiry, counting earlier batches.
+    # So cumulative sold S_i = min(D * t_i, S_(i-1) + q_i), which unrolls to
+    # S_i = Q_i + min(0, min over k <= i of (D * t_k - Q_k)), Q being the running
+    # stock total: a grouped cumsum and cummin.
+    n = len(demand)
+    expiry = pd.to_datetime(batches["expiry_date"])
+    frame = pd.DataFrame({
+        "sku": codes,
+        "med_id": batches["med_id"].to_numpy(),
+        "quantity": batches["quantity"].to_numpy(dtype="float64").clip(0, None),
+        "days_left": (expiry - pd.Timestamp(today)).dt.days.clip(lower=0).fillna(0).to_numpy(),
+    }).sort_values(["sku", "days_left", "med_id"], kind="mergesort")
+    sku = frame["sku"].to_numpy()
+    if not len(sku):
+        return np.zeros(n), np.zeros(n)
+
+    running = frame.groupby("sku", sort=False)["quantity"].cumsum()
+    slack = pd.Series(demand[sku] * frame["days_left"].to_numpy() - running.to_numpy()).groupby(sku).cummin()
+    sold = running.to_numpy() + slack.clip(upper=0).to_numpy()
+
+    stock = np.bincount(sku, weights=frame["quantity"].to_numpy(), minlength=n)
+    last = np.r_[sku[1:] != sku[:-1], True]  # last batch row of each medicine
+    usable = np.zeros(n)
+    usable[sku[last]] = sold[last]
+    return stock, usable
+
+
+# === Forecast ===
+def forecast(history, batches, today=None, window=DEFAULT_WINDOW, lead_time=DEFAULT_LEAD_TIME,
+             review_days=DEFAULT_REVIEW_DAYS, service_level=DEFAULT_SERVICE_LEVEL):
+    today = today or date.today()
+    codes, names = sku_index(batches)
+    demand, demand_std = demand_stats(history, batches, codes, window)
+    stock, usable = usable_stock(batches, codes, demand, today)
+    df = pd.DataFrame({"name": names, "stock": stock, "usable": usable,
+                       "demand": demand, "demand_std": demand_std})
+
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * df["demand_std"] * np.sqrt(lead_time)
+    reorder_point = df["demand"] * lead_time + safety
+    order_up_to = df["demand"] * (lead_time + review_days) + safety
+    selling = df["demand"] > 0
+    cover = (df["usable"] / df["demand"]).where(selling)
+    needs_order = selling & (df["usable"] <= reorder_point)
+
+    stockout = pd.Timestamp(today) + pd.to_timedelta(np.floor(cover), unit="D")
+    out = pd.DataFrame({
+        "Medicine": df["name"],
+        "Stock": df["stock"].astype("int64"),
+        "Expiring_Unsold": (df["stock"] - df["usable"]).round().astype("int64"),
+        "Usable_Stock": df["usable"].round().astype("int64"),
+        "Avg_Daily_Demand": df["demand"].round(2),
+        "Demand_Std": df["demand_std"].round(2),
+        "Days_Of_Cover": cover.round(1),
+        "Stockout_Date": stockout.dt.date.where(selling),
+        "Reorder_Point": np.ceil(reorder_point).astype("int64"),
+        "Order_Up_To": np.ceil(order_up_to).astype("int64"),
+        "Reorder_Qty": np.ceil((order_up_to - df["usable"]).clip(lower=0)).where(needs_order, 0).astype("int64"),
+    })
+    return out.sort_values(["Days_Of_Cover", "Medicine"], na_position="last").reset_index(drop=True)
+
+
+def reorder_report(path="reorder.csv", window=DEFAULT_WINDOW, lead_time=DEFAULT_LEAD_TIME,
+                   review_days=DEFAULT_REVIEW_DAYS, service_level=DEFAULT_SERVICE_LEVEL, include_all=False):
+    # Writes the reorder CSV; returns (DataFrame written, {step: seconds}).
+    today = date.today()
+    timings = {}
+    start = time.perf_counter()
+    history = load_history(window, today)
+    timings["load_history"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batches = load_batches()
+    timings["load_batches"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = forecast(history, batches, today, window, lead_time, review_days, service_level)
+    if not include_all:
+        df = df[df["Reorder_Qty"] > 0]
+    timings["forecast"] = time.perf_counter() - start
+
+    df.to_csv(path, index=False, columns=REORDER_COLUMNS)
+    return df, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast stock-outs and write reorder quantities.")
+    parser.add_argument("path", nargs="?", default="reorder.csv", help="output CSV")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="days of sales to average")
+    parser.add_argument("--lead-time", type=float, default=DEFAULT_LEAD_TIME, help="days until an order arrives")
+    parser.add_argument("--review-days", type=float, default=DEFAULT_REVIEW_DAYS,
+                        help="days an order has to last until the next review")
+    parser.add_argument("--service-level", type=float, default=DEFAULT_SERVICE_LEVEL,
+                        help="chance of not running out during the lead time (0-1)")
+    parser.add_argument("--all", action="store_true", help="include medicines that need no order")
+    args = parser.parse_args()
+    if args.window < 1 or not 0 < args.service_level < 1:
+        parser.error("--window must be >= 1 and --service-level between 0 and 1")
+
+    df, timings = reorder_report(args.path, args.window, args.lead_time, args.review_days,
+                                 args.service_level, args.all)
+    ordering = int((df["Reorder_Qty"] > 0).sum())
+    print(f"{ordering} medicines to reorder, {len(df)} rows written to {args.path}.")
+    for step, seconds in timings.items():
+        print(f"  {step:<14} {seconds * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
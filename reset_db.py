@@ -1,4 +1,4 @@
-from db_config import get_connection
+from db_config import BACKEND, get_connection
 
 def reset_all_tables():
     conn = get_connection()
@@ -10,10 +10,21 @@ def reset_all_tables():
 
         # Truncate all data
         cursor.execute("TRUNCATE TABLE sales")
+        cursor.execute("TRUNCATE TABLE medicine_supplier")
         cursor.execute("TRUNCATE TABLE medicines")
-
-        # Re-enable foreign key checks
-        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        cursor.execute("TRUNCATE TABLE medicine_stock")
+        cursor.execute("TRUNCATE TABLE daily_sales_summary")
+        cursor.execute("TRUNCATE TABLE daily_sales_archived")
+        cursor.execute("TRUNCATE TABLE sales_archive_log")
+        cursor.execute("TRUNCATE TABLE stock_movements")
+        cursor.execute("TRUNCATE TABLE stock_snapshots")
+        cursor.execute("TRUNCATE TABLE stock_snapshot_log")
+        cursor.execute("TRUNCATE TABLE expiry_alerts")
+        cursor.execute("UPDATE expiry_alert_state SET checked_through = NULL, last_med_id = 0, pending_med_id = 0")
+        cursor.execute("UPDATE rollup_state SET watermark = 0, pending_high = 0")
+        if BACKEND == "sqlite":
+            # TRUNCATE becomes DELETE there; restart the ids like TRUNCATE does on MySQL.
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('sales', 'medicines', 'stock_movements', 'expiry_alerts')")
 
         conn.commit()
         print("All table records deleted successfully. Database reset.")
@@ -23,6 +34,9 @@ def reset_all_tables():
         conn.rollback()
 
     finally:
+        # Re-enable foreign key checks before the connection goes back to the
+        # pool (outside the transaction, where SQLite ignores the pragma).
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
         cursor.close()
         conn.close()
 
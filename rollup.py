@@ -0,0 +1,187 @@
+# rollup.py
+# Incremental maintenance of daily_sales_summary(sale_date, med_id, qty).
+#
+# rollup_state keeps two sale_id marks for the 'daily_sales' rollup:
+#   watermark     - every sale with sale_id <= watermark is in the summary
+#   pending_high  - MAX(sale_id) seen by the previous catch-up run
+# Each run folds in (watermark, pending_high] and then records a new
+# pending_high. Lagging one run behind means a transaction that took a low
+# sale_id but committed late is still picked up. Reports read the summary
+# plus the raw sales tail above the watermark (DAILY_SALES_SOURCE), so they
+# are exact no matter how far behind the rollup is. Sales moved out by
+# sales_archive.py stay in the summary; their totals are kept in
+# daily_sales_archived for verify and rebuild.
+#
+#   python rollup.py catch-up | verify [--repair] | rebuild
+
+import argparse
+
+from db_config import get_connection
+
+ROLLUP_NAME = "daily_sales"
+
+# Derived table with columns (sale_date, med_id, qty) covering all sales.
+DAILY_SALES_SOURCE = f"""(
+    SELECT sale_date, med_id, qty FROM daily_sales_summary
+    UNION ALL
+    SELECT sale_date, med_id, quantity_sold AS qty FROM sales
+    WHERE sale_id > (SELECT watermark FROM rollup_state WHERE name = '{ROLLUP_NAME}')
+)"""
+
+# What the summary must equal for a given watermark (the single %s): sales
+# archived out of the sales table plus the raw sales up to the watermark.
+_ROLLED_UP_SALES = """(
+    SELECT sale_date, med_id, qty FROM daily_sales_archived
+    UNION ALL
+    SELECT sale_date, med_id, quantity_sold AS qty FROM sales WHERE sale_id <= %s
+) rolled"""
+
+
+def _lock_state(cursor):
+    cursor.execute(
+        "SELECT watermark, pending_high FROM rollup_state WHERE name = %s FOR UPDATE",
+        (ROLLUP_NAME,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise RuntimeError("rollup_state is missing; run migrations.py first.")
+    return row
+
+
+def _max_sale_id(cursor):
+    cursor.execute("SELECT COALESCE(MAX(sale_id), 0) FROM sales")
+    return cursor.fetchone()[0]
+
+
+def catch_up(conn):
+    # Folds sales newer than the watermark into the summary; returns the number of sales rolled up.
+    cursor = conn.cursor()
+    try:
+        watermark, pending_high = _lock_state(cursor)
+        rolled = 0
+        if pending_high > watermark:
+            cursor.execute("""
+                SELECT COUNT(*) FROM sales WHERE sale_id > %s AND sale_id <= %s
+            """, (watermark, pending_high))
+            rolled = cursor.fetchone()[0]
+            cursor.execute("""
+                INSERT INTO daily_sales_summary (sale_date, med_id, qty)
+                SELECT sale_date, med_id, SUM(quantity_sold)
+                FROM sales
+                WHERE sale_id > %s AND sale_id <= %s
+                GROUP BY sale_date, med_id
+                ON DUPLICATE KEY UPDATE qty = qty + VALUES(qty)
+            """, (watermark, pending_high))
+            watermark = pending_high
+
+        cursor.execute(
+            "UPDATE rollup_state SET watermark = %s, pending_high = %s WHERE name = %s",
+            (watermark, max(_max_sale_id(cursor), watermark), ROLLUP_NAME),
+        )
+        conn.commit()
+        return rolled
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def verify(conn, repair=False):
+    # Recomputes the summary from raw sales up to the watermark and returns the
+    # drifting rows as [(sale_date, med_id, expected_qty, rollup_qty), ...].
+    cursor = conn.cursor()
+    try:
+        watermark, _ = _lock_state(cursor)
+        cursor.execute(f"""
+            SELECT sale_date, med_id, SUM(qty)
+            FROM {_ROLLED_UP_SALES}
+            GROUP BY sale_date, med_id
+        """, (watermark,))
+        expected = {(d, m): int(q) for d, m, q in cursor.fetchall()}
+        cursor.execute("SELECT sale_date, med_id, qty FROM daily_sales_summary")
+        actual = {(d, m): int(q) for d, m, q in cursor.fetchall()}
+
+        drift = [
+            (key[0], key[1], expected.get(key, 0), actual.get(key, 0))
+            for key in sorted(expected.keys() | actual.keys())
+            if expected.get(key, 0) != actual.get(key, 0)
+        ]
+
+        if repair and drift:
+            for sale_date, med_id, expected_qty, _ in drift:
+                if expected_qty:
+                    cursor.execute("""
+                        INSERT INTO daily_sales_summary (sale_date, med_id, qty) VALUES (%s, %s, %s)
+                        ON DUPLICATE KEY UPDATE qty = VALUES(qty)
+                    """, (sale_date, med_id, expected_qty))
+                else:
+                    cursor.execute(
+                        "DELETE FROM daily_sales_summary WHERE sale_date = %s AND med_id = %s",
+                        (sale_date, med_id),
+                    )
+        conn.commit()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild(conn):
+    cursor = conn.cursor()
+    try:
+        _lock_state(cursor)
+        high = _max_sale_id(cursor)
+        cursor.execute("DELETE FROM daily_sales_summary")
+        cursor.execute(f"""
+            INSERT INTO daily_sales_summary (sale_date, med_id, qty)
+            SELECT sale_date, med_id, SUM(qty)
+            FROM {_ROLLED_UP_SALES}
+            GROUP BY sale_date, med_id
+        """, (high,))
+        cursor.execute(
+            "UPDATE rollup_state SET watermark = %s, pending_high = %s WHERE name = %s",
+            (high, high, ROLLUP_NAME),
+        )
+        conn.commit()
+        return high
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily_sales_summary rollup.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("catch-up", help="roll up sales newer than the watermark")
+    verify_parser = sub.add_parser("verify", help="recompute from raw sales and report drift")
+    verify_parser.add_argument("--repair", action="store_true", help="fix drifting rows")
+    sub.add_parser("rebuild", help="rebuild the rollup from scratch")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.command == "catch-up":
+            print(f"Rolled up {catch_up(conn)} sales.")
+        elif args.command == "verify":
+            drift = verify(conn, repair=args.repair)
+            if not drift:
+                print("Rollup is consistent with raw sales.")
+            else:
+                print(f"{len(drift)} rollup rows drift from raw sales:")
+                for sale_date, med_id, expected_qty, rollup_qty in drift[:20]:
+                    print(f"  {sale_date} med_id={med_id}: expected {expected_qty}, rollup {rollup_qty}")
+                if args.repair:
+                    print("Drifting rows repaired.")
+        elif args.command == "rebuild":
+            print(f"Rollup rebuilt up to sale_id {rebuild(conn)}.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# sale_service.py
+# Local HTTP service that takes sales from many terminals and records them with
+# group commit: requests are queued, and a single writer allocates (FEFO) and
+# commits them in micro-batches of up to --max-batch sales or every
+# --max-wait-ms, whichever comes first. Each caller gets its own sale result.
+#
+#   python sale_service.py serve --port 8765 --max-batch 100 --max-wait-ms 5
+#   curl -s -X POST localhost:8765/sales -d '{"medicine": "Paracetamol", "quantity": 2}'
+#   curl -s localhost:8765/stats
+#   python sale_service.py load --clients 32 --requests 200 --port 8765
+#
+# If a batch fails (deadlock, lock timeout, bad date), it is rolled back and
+# its sales are retried one per transaction, so only the faulty sale fails.
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import sys
+import time
+from datetime import datetime
+
+import rollup
+from allocation import allocate_sale
+from benchmark import summarize
+from db_config import get_connection, pool_stats
+
+DEFAULT_PORT = 8765
+MAX_BODY = 64 * 1024
+LATENCY_SAMPLES = 10000
+
+
+# === Group commit ===
+def _result(name, qty, sale_date, allocation):
+    return {
+        "medicine": name,
+        "requested": qty,
+        "sold": sum(q for _, q, _ in allocation),
+        "sale_date": sale_date,
+        "allocation": [{"med_id": m, "quantity": q} for m, q, _ in allocation],
+    }
+
+
+def commit_batch(sales):
+    # sales: [(name, qty, sale_date), ...]. Returns (results, retried) where each
+    # result is a result dict or an error string, in input order.
+    conn = get_connection()
+    try:
+        retried = False
+        try:
+            results = [_result(n, q, d, allocate_sale(conn, n, q, d)) for n, q, d in sales]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            retried = True
+            results = []
+            for n, q, d in sales:
+                try:
+                    allocation = allocate_sale(conn, n, q, d)
+                    conn.commit()
+                    results.append(_result(n, q, d, allocation))
+                except Exception as e:
+                    conn.rollback()
+                    results.append(str(e))
+
+        try:
+            rollup.catch_up(conn)
+        except Exception as e:
+            print(f"Warning: sales rollup not updated ({e}).", file=sys.stderr)
+        return results, retried
+    finally:
+        conn.close()
+
+
+class SaleBatcher:
+    def __init__(self, max_batch=100, max_wait_ms=5.0, max_queue=10000):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue(max_queue)
+        self.stats = {"received": 0, "committed": 0, "failed": 0, "rejected": 0,
+                      "batches": 0, "retried_batches": 0, "max_queue_depth": 0, "max_batch": 0}
+        self.batch_sizes = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.commit_times = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def submit(self, name, qty, sale_date):
+        # Returns a future for the sale's result; raises asyncio.QueueFull when saturated.
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((name, qty, sale_date, future))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["received"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+        return future
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Anything that queued up while the last batch was committing rides along.
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            start = time.perf_counter()
+            sales = [(name, qty, sale_date) for name, qty, sale_date, _ in batch]
+            try:
+                results, retried = await loop.run_in_executor(None, commit_batch, sales)
+            except Exception as e:
+                results, retried = [f"database unavailable: {e}"] * len(batch), False
+            self.commit_times.append(time.perf_counter() - start)
+            self.batch_sizes.append(len(batch))
+            self.stats["batches"] += 1
+            self.stats["retried_batches"] += retried
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            for (_, _, _, future), result in zip(batch, results):
+                if isinstance(result, str):
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["committed"] += 1
+                if not future.done():
+                    future.set_result(result)
+
+    def snapshot(self):
+        sizes = list(self.batch_sizes)
+        return {
+            **self.stats,
+            "queue_depth": self.queue.qsize(),
+            "mean_batch": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            "commit": summarize(self.commit_times) if self.commit_times else None,
+            "latency": summarize(self.latencies) if self.latencies else None,
+            "pool": pool_stats(),
+        }
+
+
+# === HTTP ===
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, default=str).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+def _parse_sale(body):
+    try:
+        data = json.loads(body or b"{}")
+        name = str(data["medicine"]).strip()
+        qty = int(data["quantity"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('expected JSON {"medicine": name, "quantity": n, "sale_date": "YYYY-MM-DD"}')
+    if not name or qty <= 0:
+        raise ValueError("medicine must be set and quantity must be positive")
+    sale_date = data.get("sale_date") or datetime.today().strftime('%Y-%m-%d')
+    try:
+        datetime.strptime(sale_date, "%Y-%m-%d")
+    except (ValueError, TypeError):
+        raise ValueError(f"bad sale_date {sale_date!r}, expected YYYY-MM-DD")
+    return name, qty, sale_date
+
+
+async def _handle_request(batcher, method, path, body):
+    if path == "/stats":
+        return 200, batcher.snapshot()
+    if path != "/sales":
+        return 404, {"error": f"no route {path}"}
+    if method != "POST":
+        return 405, {"error": "use POST"}
+
+    start = time.perf_counter()
+    try:
+        name, qty, sale_date = _parse_sale(body)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    try:
+        result = await batcher.submit(name, qty, sale_date)
+    except asyncio.QueueFull:
+        return 503, {"error": "sale queue is full, retry later"}
+    batcher.latencies.append(time.perf_counter() - start)
+    if isinstance(result, str):
+        return 200, {"medicine": name, "requested": qty, "sold": 0, "error": result}
+    return 200, result
+
+
+async def _serve_connection(batcher, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+            try:
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                # The body cannot be skipped without a length; answer and close.
+                writer.write(_response(400, {"error": "bad Content-Length"}, False))
+                await writer.drain()
+                break
+            if length > MAX_BODY:
+                writer.write(_response(413, {"error": "body too large"}, False))
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            status, payload = await _handle_request(batcher, method, path.split("?")[0], body)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, max_batch, max_wait_ms, max_queue):
+    batcher = SaleBatcher(max_batch, max_wait_ms, max_queue)
+    writer_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(lambda r, w: _serve_connection(batcher, r, w), host, port)
+    print(f"Sale service on http://{host}:{port} (batch {max_batch} sales / {max_wait_ms} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        writer_task.cancel()
+
+
+# === Load client ===
+async def _request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _client(host, port, names, requests, max_qty, seed, latencies, counts):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            status, result = await _request(reader, writer, host, "POST", "/sales",
+                                            {"medicine": rng.choice(names), "quantity": rng.randint(1, max_qty)})
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                counts["rejected"] += 1
+            elif result.get("error"):
+                counts["errors"] += 1
+            elif result["sold"]:
+                counts["sales"] += 1
+                counts["units"] += result["sold"]
+            else:
+                counts["empty"] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, names, clients, requests, max_qty):
+    latencies = []
+    counts = collections.Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, names, requests, max_qty, seed, latencies, counts)
+                           for seed in range(1, clients + 1)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, server_stats = await _request(reader, writer, host, "GET", "/stats")
+    writer.close()
+    return {
+        "clients": clients,
+        "requests": clients * requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(clients * requests / elapsed, 1),
+        **{key: counts[key] for key in ("sales", "units", "empty", "errors", "rejected")},
+        "latency": summarize(latencies),
+        "server": server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group-commit sale ingestion service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="run the service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--max-batch", type=int, default=100, help="most sales per commit")
+    serve_parser.add_argument("--max-wait-ms", type=float, default=5.0, help="longest a sale waits for its batch")
+    serve_parser.add_argument("--max-queue", type=int, default=10000, help="queued sales before answering 503")
+
+    load_parser = sub.add_parser("load", help="drive a running service with concurrent clients")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load_parser.add_argument("--clients", type=int, default=16, help="concurrent terminals")
+    load_parser.add_argument("--requests", type=int, default=100, help="sales per terminal")
+    load_parser.add_argument("--max-qty", type=int, default=3)
+    load_parser.add_argument("--hot", type=int, default=20, help="medicines to sell, most stocked first")
+    load_parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms, args.max_queue))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    from load_test import pick_hot_medicines
+    names = pick_hot_medicines(args.hot)
+    if not names:
+        sys.exit("No sellable stock found; run generate_data.py first.")
+    report = asyncio.run(run_load(args.host, args.port, names, args.clients, args.requests, args.max_qty))
+    server = report["server"]
+    print(f"{report['requests']} requests in {report['seconds']}s = {report['requests_per_sec']} req/sec "
+          f"from {report['clients']} clients")
+    print(f"  sold: {report['sales']} ({report['units']} units), out of stock: {report['empty']}, "
+          f"errors: {report['errors']}, rejected: {report['rejected']}")
+    print(f"  latency p50 {report['latency']['p50_ms']} ms, p95 {report['latency']['p95_ms']} ms")
+    print(f"  server: {server['batches']} batches, mean {server['mean_batch']} / max {server['max_batch']} sales, "
+          f"max queue depth {server['max_queue_depth']}, retried batches {server['retried_batches']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
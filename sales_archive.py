@@ -0,0 +1,197 @@
+# sales_archive.py
+# Moves whole months of sales older than a retention window out of the sales
+# table into compressed files (one per month, CSV.gz or Parquet), so the live
+# table, the raw-sales views and the rollup's raw tail stay small.
+#
+# Only sales already folded into daily_sales_summary are moved, and their
+# per-day totals are added to daily_sales_archived in the same transaction as
+# the delete, so rollup reports, rollup.py verify and rollup.py rebuild stay
+# exact. Each month's file is written completely before any row is deleted.
+#
+#   python sales_archive.py archive --retention-days 365 --dir archive
+#   python sales_archive.py archive --retention-days 365 --format parquet --dry-run
+#   python sales_archive.py status
+
+import argparse
+import os
+from datetime import date, timedelta
+
+import exporters
+import rollup
+from db_config import get_connection
+
+DEFAULT_RETENTION_DAYS = 365
+
+ARCHIVE_QUERY = """
+    SELECT s.sale_id, s.med_id, m.name AS medicine_name, m.manufacturer, s.quantity_sold, s.sale_date
+    FROM sales s
+    LEFT JOIN medicines m ON s.med_id = m.med_id
+    WHERE s.sale_date >= %s AND s.sale_date < %s AND s.sale_id <= %s
+    ORDER BY s.sale_id ASC
+"""
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def archive_cutoff(retention_days, today=None):
+    # First day of the month that contains (today - retention); everything
+    # before it is archived, so only complete months leave the table.
+    today = today or date.today()
+    return _month_start(today - timedelta(days=retention_days))
+
+
+def _archive_path(directory, month, fmt):
+    ext = ".parquet" if fmt == "parquet" else ".csv.gz"
+    base = os.path.join(directory, f"sales-{month:%Y-%m}")
+    path, n = base + ext, 1
+    # A later run can find more sales for an archived month (back-dated sales).
+    while os.path.exists(path):
+        n += 1
+        path = f"{base}.{n}{ext}"
+    return path
+
+
+def _months_to_archive(cursor, cutoff, watermark):
+    cursor.execute("SELECT MIN(sale_date) FROM sales WHERE sale_date < %s AND sale_id <= %s",
+                   (cutoff, watermark))
+    oldest = cursor.fetchone()[0]
+    if isinstance(oldest, str):
+        oldest = date.fromisoformat(oldest[:10])  # SQLite returns aggregates untyped
+    months = []
+    month = _month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def _archive_month(conn, month, watermark, directory, fmt):
+    end = _next_month(month)
+    params = (month, end, watermark)
+    path = _archive_path(directory, month, fmt)
+    tmp = path + ".part"
+
+    chunks = exporters.iter_chunks(ARCHIVE_QUERY, params)
+    if fmt == "parquet":
+        written = exporters.write_parquet(tmp, chunks, "zstd")
+    else:
+        written = exporters.write_csv(tmp, chunks, "gzip")
+    if not written:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    os.replace(tmp, path)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT MIN(sale_id), MAX(sale_id), COUNT(*), COALESCE(SUM(quantity_sold), 0)
+            FROM sales
+            WHERE sale_date >= %s AND sale_date < %s AND sale_id <= %s
+        """, params)
+        first_id, last_id, count, units = cursor.fetchone()
+        if count != written:
+            raise RuntimeError(f"{month:%Y-%m}: wrote {written} sales but {count} match; not deleting")
+
+        cursor.execute("""
+            INSERT INTO daily_sales_archived (sale_date, med_id, qty)
+            SELECT sale_date, med_id, SUM(quantity_sold)
+            FROM sales
+            WHERE sale_date >= %s AND sale_date < %s AND sale_id <= %s
+            GROUP BY sale_date, med_id
+            ON DUPLICATE KEY UPDATE qty = qty + VALUES(qty)
+        """, params)
+        cursor.execute("""
+            INSERT INTO sales_archive_log (period_start, first_sale_id, last_sale_id, sales, units, path)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (month, first_id, last_id, count, int(units), path))
+        cursor.execute("DELETE FROM sales WHERE sale_date >= %s AND sale_date < %s AND sale_id <= %s", params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return {"month": f"{month:%Y-%m}", "sales": count, "units": int(units), "path": path}
+
+
+def archive(retention_days=DEFAULT_RETENTION_DAYS, directory="archive", fmt="csv", dry_run=False):
+    cutoff = archive_cutoff(retention_days)
+    conn = get_connection()
+    try:
+        # Two catch-ups move the watermark past every sale committed before
+        # this run (the rollup lags one run behind on purpose).
+        rollup.catch_up(conn)
+        rollup.catch_up(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT watermark FROM rollup_state WHERE name = %s", (rollup.ROLLUP_NAME,))
+        watermark = cursor.fetchone()[0]
+        months = _months_to_archive(cursor, cutoff, watermark)
+        cursor.close()
+
+        if dry_run:
+            return {"cutoff": cutoff, "months": [f"{m:%Y-%m}" for m in months], "archived": []}
+
+        os.makedirs(directory, exist_ok=True)
+        archived = []
+        for month in months:
+            result = _archive_month(conn, month, watermark, directory, fmt)
+            if result:
+                archived.append(result)
+                print(f"  {result['month']}: {result['sales']} sales -> {result['path']}")
+        return {"cutoff": cutoff, "months": [f"{m:%Y-%m}" for m in months], "archived": archived}
+    finally:
+        conn.close()
+
+
+def status():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(sale_date), MAX(sale_date), COUNT(*) FROM sales")
+        live = cursor.fetchone()
+        cursor.execute("""
+            SELECT period_start, sales, units, path, archived_on
+            FROM sales_archive_log
+            ORDER BY period_start ASC, first_sale_id ASC
+        """)
+        return live, cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old sales out of the sales table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    archive_parser = sub.add_parser("archive", help="move complete months older than the retention window")
+    archive_parser.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS)
+    archive_parser.add_argument("--dir", default="archive", help="directory for the archive files")
+    archive_parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                                help="csv (gzip) or parquet (zstd)")
+    archive_parser.add_argument("--dry-run", action="store_true", help="only list the months that would move")
+    sub.add_parser("status", help="show live sales range and archived months")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        result = archive(args.retention_days, args.dir, args.format, args.dry_run)
+        if args.dry_run:
+            print(f"Would archive sales before {result['cutoff']}: {', '.join(result['months']) or 'nothing'}")
+        else:
+            total = sum(r["sales"] for r in result["archived"])
+            print(f"Archived {total} sales from {len(result['archived'])} months before {result['cutoff']}.")
+    else:
+        (oldest, newest, count), log = status()
+        print(f"Live sales: {count} rows from {oldest} to {newest}")
+        for period_start, sales, units, path, archived_on in log:
+            print(f"  {period_start:%Y-%m}: {sales} sales, {units} units in {path} (archived {archived_on})")
+
+
+if __name__ == "__main__":
+    main()
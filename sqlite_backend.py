@@ -0,0 +1,233 @@
+# sqlite_backend.py
+# Embedded SQLite backend, selected with backend = sqlite in db_config.ini or
+# MEDINV_DB_BACKEND=sqlite; the database is the single file at path
+# (MEDINV_DB_PATH), in WAL mode. Meant for small branches with no MySQL server,
+# and for running the benchmarks and load tests locally.
+#
+# The rest of the code keeps writing MySQL-flavoured SQL with %s placeholders;
+# the connection adapter below rewrites the handful of MySQL-only constructs.
+# Text columns that are compared by value use COLLATE NOCASE to match MySQL's
+# case-insensitive default collation.
+
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# Applied to every new connection. WAL lets readers run while a sale commits;
+# synchronous=NORMAL is durable across application crashes in WAL mode and
+# only risks the last commits on power loss.
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",     # 64 MiB page cache per connection
+    "PRAGMA mmap_size = 268435456",   # 256 MiB memory-mapped reads
+]
+
+# Dates are stored as ISO text and converted back by declared column type.
+# Prices arrive as Decimal from bulk_import and are stored as REAL.
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" "))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+_REWRITES = [
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\bLIKE\s+%s", re.I), r"LIKE %s ESCAPE '\\'"),
+    (re.compile(r"<=>"), "IS"),
+    (re.compile(r"\bTRUNCATE\s+TABLE\b", re.I), "DELETE FROM"),
+    (re.compile(r"\bSET\s+FOREIGN_KEY_CHECKS\s*=\s*0\b", re.I), "PRAGMA foreign_keys = OFF"),
+    (re.compile(r"\bSET\s+FOREIGN_KEY_CHECKS\s*=\s*1\b", re.I), "PRAGMA foreign_keys = ON"),
+    (re.compile(r"%s"), "?"),
+]
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.I)
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    # Returns (sqlite_sql, wants_write_lock).
+    sql = sql.strip()
+    wants_lock = bool(_FOR_UPDATE.search(sql))
+    if wants_lock:
+        sql = _FOR_UPDATE.sub("", sql)
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql, wants_lock
+
+
+class SQLiteCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn._db.cursor()
+
+    def execute(self, sql, params=()):
+        sql, wants_lock = translate(sql)
+        if wants_lock:
+            # SELECT ... FOR UPDATE: take the write lock up front so a later
+            # UPDATE in the same transaction cannot fail with SQLITE_BUSY.
+            self._conn._begin_immediate()
+        self._cursor.execute(sql, tuple(params or ()))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sql, _ = translate(sql)
+        self._cursor.executemany(sql, [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    # Mimics the parts of the mysql.connector connection API the code uses.
+
+    def __init__(self, db):
+        self._db = db
+
+    def cursor(self, *args, **kwargs):
+        # buffered= / dictionary= options are MySQL driver specific; SQLite
+        # cursors always stream from the local file.
+        return SQLiteCursor(self)
+
+    def _begin_immediate(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def is_connected(self):
+        try:
+            self._db.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        try:
+            # Cheap; refreshes planner statistics for tables whose shape changed.
+            self._db.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        self._db.close()
+
+
+def connect(path):
+    db = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,  # pooled connections move between threads
+        timeout=30,  # busy timeout while another connection holds the write lock
+    )
+    for pragma in PRAGMAS:
+        db.execute(pragma)
+    return SQLiteConnection(db)
+
+
+# Schema as of migration SCHEMA_VERSION (init_db + migrations 1-7 on MySQL).
+# init_db creates it on a new database, marks those migrations as applied and
+# runs any later ones, which are written to work on both backends.
+SCHEMA_VERSION = 7
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS medicines (
+        med_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100) COLLATE NOCASE,
+        category VARCHAR(100) COLLATE NOCASE,
+        quantity INT,
+        price DECIMAL(10,2),
+        expiry_date DATE,
+        manufacturer VARCHAR(100) COLLATE NOCASE,
+        added_on DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_medicines_batch
+    ON medicines (name, expiry_date, manufacturer, category, price)
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_medicines_expiry ON medicines (expiry_date)",
+    """
+    CREATE TABLE IF NOT EXISTS suppliers (
+        supplier_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100) COLLATE NOCASE,
+        contact_info VARCHAR(100)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_suppliers_name ON suppliers (name)",
+    """
+    CREATE TABLE IF NOT EXISTS medicine_supplier (
+        med_id INT NOT NULL REFERENCES medicines(med_id),
+        supplier_id INT NOT NULL REFERENCES suppliers(supplier_id),
+        PRIMARY KEY (med_id, supplier_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_medicine_supplier_supplier ON medicine_supplier (supplier_id)",
+    """
+    CREATE TABLE IF NOT EXISTS sales (
+        sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        med_id INT REFERENCES medicines(med_id),
+        quantity_sold INT,
+        sale_date DATE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sales_date_med ON sales (sale_date, med_id)",
+    """
+    CREATE TABLE IF NOT EXISTS daily_sales_summary (
+        sale_date DATE NOT NULL,
+        med_id INT NOT NULL,
+        qty INT NOT NULL,
+        PRIMARY KEY (sale_date, med_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_daily_sales_summary_med ON daily_sales_summary (med_id)",
+    """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name VARCHAR(50) PRIMARY KEY,
+        watermark INT NOT NULL DEFAULT 0,
+        pending_high INT NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO rollup_state (name, watermark, pending_high) VALUES ('daily_sales', 0, 0)",
+]
+
+
+def create_schema(conn):
+    cursor = conn.cursor()
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    conn.commit()
+    cursor.close()
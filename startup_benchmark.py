@@ -0,0 +1,81 @@
+# startup_benchmark.py
+# Measures import-time cost of the CLI entry points with `python -X importtime`
+# and fails if a heavy library is imported at startup or the budget is exceeded.
+#
+#   python startup_benchmark.py                 # check analytics and main
+#   python startup_benchmark.py --budget-ms 80 --top 10 analytics
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Must only ever be imported on first use, never at module load.
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "streamlit", "plotly", "mysql"]
+DEFAULT_MODULES = ["analytics", "main"]
+
+
+def measure(module, runs=5):
+    # Returns (best total microseconds, {top-level module: cumulative us}) over several runs.
+    here = os.path.dirname(os.path.abspath(__file__))
+    best_total, best_modules = None, None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=here, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+
+        modules = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = [part.strip() for part in line.split("|")]
+            if cumulative.isdigit():
+                modules[name.strip()] = int(cumulative)
+        total = modules.get(module, 0)
+        if best_total is None or total < best_total:
+            best_total, best_modules = total, modules
+    return best_total, best_modules
+
+
+def check(modules, budget_ms, top):
+    report, failures = {}, []
+    for module in modules:
+        total_us, imported = measure(module)
+        heavy = sorted({name.split(".")[0] for name in imported} & set(HEAVY_MODULES))
+        slowest = sorted(imported.items(), key=lambda kv: kv[1], reverse=True)[1:top + 1]
+        report[module] = {"import_ms": round(total_us / 1000, 2), "heavy_imports": heavy,
+                          "slowest": [{"module": m, "ms": round(us / 1000, 2)} for m, us in slowest]}
+        if heavy:
+            failures.append(f"{module} imports heavy modules at startup: {', '.join(heavy)}")
+        if total_us / 1000 > budget_ms:
+            failures.append(f"{module} import took {total_us / 1000:.1f} ms (budget {budget_ms} ms)")
+    return report, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard CLI startup time against regressions.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="max import time per module")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report, failures = check(args.modules, args.budget_ms, args.top)
+    if args.json:
+        print(json.dumps({"modules": report, "failures": failures}, indent=2))
+    else:
+        for module, data in report.items():
+            print(f"{module}: {data['import_ms']} ms")
+            for entry in data["slowest"]:
+                print(f"    {entry['module']:<30} {entry['ms']:>8} ms")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
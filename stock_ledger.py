@@ -0,0 +1,237 @@
+# stock_ledger.py
+# Append-only ledger of stock changes per batch (stock_movements) plus
+# periodic per-batch snapshots (stock_snapshots), so stock on hand at the end
+# of any day is the latest snapshot up to that day plus the movements after it,
+# not a replay of all history.
+#
+# Every code path that changes medicines.quantity appends its movement in the
+# same transaction with record(): intake (add_medicine, bulk_import,
+# generate_data), adjust (restock / update_quantity), sale (allocation) and
+# quarantine (expiry_alerts).
+# Migration 011 opened the ledger with each batch's quantity at that moment.
+# moved_at is when the change was recorded, not a back-dated sale_date.
+#
+#   python stock_ledger.py snapshot                  # end of yesterday; run daily or weekly
+#   python stock_ledger.py snapshot --date 2025-06-30
+#   python stock_ledger.py on-date 2025-06-30 --output stock_2025-06-30.csv
+#   python stock_ledger.py verify                    # ledger totals vs medicines.quantity
+
+import argparse
+import csv
+from datetime import date, datetime, time, timedelta
+
+from db_config import get_connection
+
+OPENING = "opening"
+INTAKE = "intake"
+ADJUST = "adjust"
+SALE = "sale"
+QUARANTINE = "quarantine"
+
+
+def _day_end(day):
+    # Movements before this instant belong to the day (or earlier).
+    return datetime.combine(day + timedelta(days=1), time.min)
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])  # SQLite returns aggregates untyped
+    return value
+
+
+# === Writing ===
+def record(cursor, movements, kind, moved_at=None):
+    # movements: [(med_id, delta), ...]; zero deltas are skipped. Runs on the
+    # caller's cursor so the entry commits or rolls back with the change.
+    moved_at = moved_at or datetime.now()
+    rows = [(med_id, delta, kind, moved_at) for med_id, delta in movements if delta]
+    if rows:
+        cursor.executemany(
+            "INSERT INTO stock_movements (med_id, delta, kind, moved_at) VALUES (%s, %s, %s, %s)", rows)
+
+
+def record_new_batches(cursor, after_med_id, kind=INTAKE, moved_at=None):
+    # Intake for every batch inserted with med_id > after_med_id, for bulk loaders.
+    cursor.execute("""
+        INSERT INTO stock_movements (med_id, delta, kind, moved_at)
+        SELECT med_id, quantity, %s, %s FROM medicines
+        WHERE med_id > %s AND quantity <> 0
+    """, (kind, moved_at or datetime.now(), after_med_id))
+
+
+def max_med_id(cursor):
+    cursor.execute("SELECT COALESCE(MAX(med_id), 0) FROM medicines")
+    return cursor.fetchone()[0]
+
+
+# === Snapshots ===
+def latest_snapshot(cursor, day):
+    # Date of the newest snapshot taken for day or earlier, or None.
+    cursor.execute("SELECT MAX(snapshot_date) FROM stock_snapshot_log WHERE snapshot_date <= %s", (day,))
+    return _as_date(cursor.fetchone()[0])
+
+
+def _on_hand(base, day):
+    # Stock per batch at the end of day from the snapshot of base (None: no
+    # snapshot, the whole ledger) plus the movements after it.
+    snapshot_rows, params = "", []
+    if base is not None:
+        snapshot_rows = """
+            SELECT med_id, quantity AS qty FROM stock_snapshots WHERE snapshot_date = %s
+            UNION ALL"""
+        params.append(base)
+    movements = "SELECT med_id, delta AS qty FROM stock_movements WHERE moved_at < %s"
+    params.append(_day_end(day))
+    if base is not None:
+        movements += " AND moved_at >= %s"
+        params.append(_day_end(base))
+    sql = f"""(
+        SELECT x.med_id, SUM(x.qty) AS quantity
+        FROM ({snapshot_rows}
+            {movements}
+        ) x
+        GROUP BY x.med_id
+    ) on_hand"""
+    return sql, params
+
+
+def on_hand_source(cursor, day):
+    # Returns (sql, params) for a derived table "on_hand" (med_id, quantity)
+    # with each batch's stock at the end of day: the newest snapshot up to day
+    # plus the slice of movements recorded after it.
+    return _on_hand(latest_snapshot(cursor, day), day)
+
+
+def snapshot(conn, day=None):
+    # Stores every batch's stock at the end of day (default yesterday) and
+    # returns (batches, units). Built from the previous snapshot plus the
+    # movements since, so it costs one slice of the ledger. Only complete days
+    # can be snapshotted.
+    day = day or date.today() - timedelta(days=1)
+    if day >= date.today():
+        raise ValueError(f"{day} has not ended yet; snapshots are taken for past days.")
+    cursor = conn.cursor()
+    try:
+        # Start from the snapshot before day, so re-taking a day recomputes it.
+        source, params = _on_hand(latest_snapshot(cursor, day - timedelta(days=1)), day)
+        cursor.execute("DELETE FROM stock_snapshots WHERE snapshot_date = %s", (day,))
+        cursor.execute("DELETE FROM stock_snapshot_log WHERE snapshot_date = %s", (day,))
+        cursor.execute(f"""
+            INSERT INTO stock_snapshots (snapshot_date, med_id, quantity)
+            SELECT %s, med_id, quantity FROM {source}
+            WHERE quantity <> 0
+        """, [day] + params)
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(quantity), 0) FROM stock_snapshots WHERE snapshot_date = %s
+        """, (day,))
+        batches, units = cursor.fetchone()
+        cursor.execute("""
+            INSERT INTO stock_snapshot_log (snapshot_date, batches, units, taken_on)
+            VALUES (%s, %s, %s, %s)
+        """, (day, batches, int(units), datetime.now()))
+        conn.commit()
+        return batches, int(units)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# === Reports ===
+def stock_on(conn, day, by_batch=False):
+    # Stock on hand at the end of day for every medicine (or batch) that had
+    # any, in one query. Returns (columns, rows).
+    cursor = conn.cursor()
+    try:
+        source, params = on_hand_source(cursor, day)
+        if by_batch:
+            columns = ["med_id", "name", "category", "quantity", "expiry_date"]
+            cursor.execute(f"""
+                SELECT m.med_id, m.name, m.category, on_hand.quantity, m.expiry_date
+                FROM {source}
+                JOIN medicines m ON m.med_id = on_hand.med_id
+                WHERE on_hand.quantity <> 0
+                ORDER BY m.name, m.expiry_date, m.med_id
+            """, params)
+        else:
+            columns = ["name", "quantity", "batches"]
+            cursor.execute(f"""
+                SELECT m.name, SUM(on_hand.quantity) AS quantity, COUNT(*) AS batches
+                FROM {source}
+                JOIN medicines m ON m.med_id = on_hand.med_id
+                WHERE on_hand.quantity <> 0
+                GROUP BY m.name
+                ORDER BY m.name
+            """, params)
+        return columns, cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def verify(conn):
+    # Ledger total per batch against medicines.quantity; returns the batches
+    # that disagree as [(med_id, name, quantity, ledger), ...].
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT m.med_id, m.name, m.quantity, COALESCE(l.total, 0)
+            FROM medicines m
+            LEFT JOIN (
+                SELECT med_id, SUM(delta) AS total FROM stock_movements GROUP BY med_id
+            ) l ON l.med_id = m.med_id
+            WHERE m.quantity <> COALESCE(l.total, 0)
+            ORDER BY m.med_id
+        """)
+        return [(med_id, name, quantity, int(total)) for med_id, name, quantity, total in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock movement ledger, snapshots and stock on a date.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    snapshot_parser = sub.add_parser("snapshot", help="store every batch's stock at the end of a day")
+    snapshot_parser.add_argument("--date", type=date.fromisoformat, help="YYYY-MM-DD (default yesterday)")
+    on_date = sub.add_parser("on-date", help="stock on hand per medicine at the end of a day")
+    on_date.add_argument("date", type=date.fromisoformat, help="YYYY-MM-DD")
+    on_date.add_argument("--by-batch", action="store_true", help="one row per batch instead of per medicine")
+    on_date.add_argument("--output", help="write CSV here instead of printing")
+    sub.add_parser("verify", help="compare ledger totals with medicines.quantity")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.command == "snapshot":
+            try:
+                batches, units = snapshot(conn, args.date)
+            except ValueError as e:
+                parser.error(str(e))
+            print(f"Snapshot stored: {batches} batches, {units} units.")
+        elif args.command == "on-date":
+            columns, rows = stock_on(conn, args.date, args.by_batch)
+            if args.output:
+                with open(args.output, "w", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                    writer.writerows(rows)
+                print(f"{len(rows)} rows written to {args.output}.")
+            else:
+                print("  ".join(columns))
+                for row in rows:
+                    print("  ".join(str(v) for v in row))
+        elif args.command == "verify":
+            drift = verify(conn)
+            if not drift:
+                print("Stock ledger matches medicines.quantity.")
+            else:
+                print(f"{len(drift)} batches differ from the ledger (med_id, name, quantity, ledger):")
+                for row in drift[:20]:
+                    print(f"  {row}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# stock_summary.py
+# medicine_stock holds one row per medicine name:
+#   total_qty        - units over all its batches
+#   batches          - number of batch rows
+#   sellable_qty     - units in batches with stock that had not expired on as_of
+#   earliest_expiry  - earliest expiry among those batches
+#   as_of            - the day sellable_qty / earliest_expiry are counted from
+#
+# Triggers on medicines (migration 010) apply every batch insert, update and
+# delete to the row in the same transaction, whichever code path writes it
+# (main.py, allocation, bulk_import, sale_service). Only the calendar makes a
+# row stale: once earliest_expiry < today some counted stock has expired.
+# Readers go through stock_source(), which recomputes just those rows from
+# their batches; refresh stores the recomputed values (run it daily).
+#
+#   python stock_summary.py refresh | verify [--repair] | rebuild
+
+import argparse
+from datetime import date
+
+from db_config import get_connection
+
+# Per-name totals straight from the batches, counting sellable stock as of the
+# single %s.
+_FROM_BATCHES = """
+    SELECT name,
+           SUM(quantity) AS total_qty,
+           COUNT(*) AS batches,
+           SUM(CASE WHEN quantity > 0 AND expiry_date >= %s THEN quantity ELSE 0 END) AS sellable_qty,
+           MIN(CASE WHEN quantity > 0 AND expiry_date >= %s THEN expiry_date END) AS earliest_expiry
+    FROM medicines
+    GROUP BY name
+"""
+
+_SELLABLE = """(SELECT {agg} FROM medicines m
+         WHERE m.name = {name} AND m.quantity > 0 AND m.expiry_date >= %s)"""
+
+
+def stock_source(today=None):
+    # Returns (sql, params) for a derived table "stock" with columns (name,
+    # total_qty, batches, sellable_qty, earliest_expiry) that is exact for
+    # today; only rows with expired stock counted as sellable touch medicines.
+    today = today or date.today()
+    sellable = _SELLABLE.format(agg="COALESCE(SUM(m.quantity), 0)", name="st.name")
+    earliest = _SELLABLE.format(agg="MIN(m.expiry_date)", name="st.name")
+    sql = f"""(
+        SELECT st.name, st.total_qty, st.batches,
+               CASE WHEN st.earliest_expiry < %s THEN {sellable} ELSE st.sellable_qty END AS sellable_qty,
+               CASE WHEN st.earliest_expiry < %s THEN {earliest} ELSE st.earliest_expiry END AS earliest_expiry
+        FROM medicine_stock st
+        WHERE st.batches > 0
+    ) stock"""
+    return sql, [today, today, today, today]
+
+
+def refresh(conn, today=None):
+    # Stores today's values for the stale rows; returns how many were updated.
+    today = today or date.today()
+    sellable = _SELLABLE.format(agg="COALESCE(SUM(m.quantity), 0)", name="medicine_stock.name")
+    earliest = _SELLABLE.format(agg="MIN(m.expiry_date)", name="medicine_stock.name")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            UPDATE medicine_stock
+            SET sellable_qty = {sellable},
+                earliest_expiry = {earliest},
+                as_of = %s
+            WHERE earliest_expiry < %s
+        """, (today, today, today, today))
+        updated = cursor.rowcount
+        conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _normalize(values):
+    total, batches, sellable, earliest = values
+    if isinstance(earliest, str):
+        earliest = date.fromisoformat(earliest[:10])  # SQLite returns aggregates untyped
+    return int(total or 0), int(batches or 0), int(sellable or 0), earliest
+
+
+def verify(conn, repair=False):
+    # Refreshes, then recomputes every row from the batches and returns the
+    # drifting ones as [(name, expected, summary), ...], each a
+    # (total_qty, batches, sellable_qty, earliest_expiry) tuple.
+    today = date.today()
+    refresh(conn, today)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_FROM_BATCHES, (today, today))
+        expected = {row[0].casefold(): (row[0], _normalize(row[1:])) for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT name, total_qty, batches, sellable_qty, earliest_expiry FROM medicine_stock
+        """)
+        actual = {row[0].casefold(): (row[0], _normalize(row[1:])) for row in cursor.fetchall()}
+
+        empty = (0, 0, 0, None)
+        drift = []
+        for key in sorted(expected.keys() | actual.keys()):
+            name, want = expected.get(key, (None, empty))
+            stored_name, have = actual.get(key, (None, empty))
+            if want != have:
+                drift.append((name or stored_name, want, have))
+
+        if repair:
+            for name, want, have in drift:
+                if want == empty:
+                    cursor.execute("DELETE FROM medicine_stock WHERE name = %s", (name,))
+                    continue
+                cursor.execute("""
+                    INSERT INTO medicine_stock (name, total_qty, batches, sellable_qty, earliest_expiry, as_of)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE total_qty = VALUES(total_qty), batches = VALUES(batches),
+                        sellable_qty = VALUES(sellable_qty), earliest_expiry = VALUES(earliest_expiry),
+                        as_of = VALUES(as_of)
+                """, (name, *want, today))
+        conn.commit()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild(conn):
+    # Recomputes the whole table; returns the number of medicine names.
+    today = date.today()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM medicine_stock")
+        cursor.execute(f"""
+            INSERT INTO medicine_stock (name, total_qty, batches, sellable_qty, earliest_expiry, as_of)
+            SELECT b.name, b.total_qty, b.batches, b.sellable_qty, b.earliest_expiry, %s
+            FROM ({_FROM_BATCHES}) b
+        """, (today, today, today))
+        rows = cursor.rowcount
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the medicine_stock summary.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refresh", help="recount medicines whose counted stock has expired")
+    verify_parser = sub.add_parser("verify", help="recompute from the batches and report drift")
+    verify_parser.add_argument("--repair", action="store_true", help="fix drifting rows")
+    sub.add_parser("rebuild", help="rebuild the summary from scratch")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.command == "refresh":
+            print(f"Refreshed {refresh(conn)} medicines.")
+        elif args.command == "verify":
+            drift = verify(conn, repair=args.repair)
+            if not drift:
+                print("medicine_stock is consistent with the batches.")
+            else:
+                print(f"{len(drift)} medicine_stock rows drift from the batches "
+                      "(total, batches, sellable, earliest expiry):")
+                for name, want, have in drift[:20]:
+                    print(f"  {name}: expected {want}, summary {have}")
+                if args.repair:
+                    print("Drifting rows repaired.")
+        elif args.command == "rebuild":
+            print(f"medicine_stock rebuilt for {rebuild(conn)} medicines.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()